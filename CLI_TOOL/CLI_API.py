@@ -1,18 +1,53 @@
+import argparse
+import contextlib
 import asyncio
-import aiohttp
-import pandas as pd
-from tqdm.asyncio import tqdm
+import importlib
 import logging
 from getpass import getpass
 import os
 import csv
+import hashlib
+import heapq
+import itertools
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+from array import array
+from collections import Counter, deque
+from collections.abc import Mapping
+from numbers import Number
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime
 import time # Added for simulation delays
+import warnings
 
 # Configure logging for better output during simulation
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+
+class LazyModule:
+    """
+    Stands in for a heavy module (pandas, aiohttp) until one of its attributes is first
+    used, so the CLI reaches its first prompt without paying for those imports. On first
+    use the real module is imported and replaces this placeholder in the module globals.
+    """
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module # Later lookups go straight to the real module
+        return getattr(module, attr)
+
+
+pd = LazyModule("pandas", "pd")
+aiohttp = LazyModule("aiohttp", "aiohttp")
+
 # Mapping of human-readable field names to generic API integration names.
 # These are kept for demonstration, but the actual 'values'
 # represent a generic API's expected field names.
@@ -48,13 +83,36 @@ FIELD_MAP = {
     "Toll Tag Expiration": "toll_tag_expiration_api_field",
 }
 
-def prompt_credentials():
-    """Prompts for generic API credentials."""
+# Expected type/format of the values in FIELD_MAP columns, checked before anything is sent.
+# Fields not listed here are free text. Supported keys: "type" ("date", "number" or
+# "integer"), "min"/"max" for numbers, and "pattern" (a regex the whole value must match).
+FIELD_SCHEMA = {
+    "Accessory Last Annual PM": {"type": "date"},
+    "Accessory Next Annual PM": {"type": "date"},
+    "Accessory Last PM": {"type": "date"},
+    "Accessory Next PM": {"type": "date"},
+    "Chassis Last Annual PM": {"type": "date"},
+    "Chassis Next Annual PM Due Date": {"type": "date"},
+    "Chassis Last PM": {"type": "date"},
+    "Chassis Next PM Due Date": {"type": "date"},
+    "Engine Notification Value": {"type": "number", "min": 0},
+    "Engine Year": {"type": "integer", "min": 1900, "max": 2100},
+    "Camera IMEI": {"pattern": r"\d{15}"},
+    "GVW": {"type": "number", "min": 0},
+    "License Exp": {"type": "date"},
+    "License Expiration": {"type": "date"},
+    "License State": {"pattern": r"[A-Za-z]{2}"},
+    "Toll Tag Effective Date": {"type": "date"},
+    "Toll Tag Expiration": {"type": "date"},
+}
+
+def prompt_credentials(ask_customer_id=True):
+    """Prompts for generic API credentials. Multi-tenant runs take customer IDs from the input instead."""
     logging.info("🔐 Enter your API credentials (for demonstration purposes):")
     login_name = input("Username: ").strip()
     password = getpass("Password: ").strip()
     # For a public repo, you might even hardcode 'demo_id' here or make it optional.
-    customer_id = input("Customer ID (e.g., 'DEMO_CUST_ID'): ").strip()
+    customer_id = input("Customer ID (e.g., 'DEMO_CUST_ID'): ").strip() if ask_customer_id else None
     return login_name, password, customer_id
 
 
@@ -97,11 +155,10 @@ def get_default_template_path():
 
 
 def create_excel_template(path, selected_fields, overwrite=False):
-    """Creates an Excel template with specified headers."""
+    """Creates an Excel (or, for a .csv path, CSV) template with specified headers."""
     # The 'equipment_id' is a placeholder for the unique identifier used in updates.
     # It can be generalized to 'record_id' or 'unique_identifier' as needed.
     headers = ['equipment_id'] + selected_fields
-    df = pd.DataFrame(columns=headers)
 
     if Path(path).exists() and not overwrite:
         logging.warning(f"⚠️ File already exists: {path}")
@@ -111,7 +168,15 @@ def create_excel_template(path, selected_fields, overwrite=False):
             return
 
     try:
-        df.to_excel(path, index=False)
+        if Path(path).suffix.lower() == ".csv":
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(headers)
+        else:
+            from openpyxl import Workbook # A header row does not need pandas
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+            sheet.append(headers)
+            workbook.save(path)
         logging.info(f"✅ Template saved to: {path}")
     except Exception as e:
         logging.error(f"❌ Failed to save Excel template: {e}")
@@ -121,63 +186,858 @@ def create_excel_template(path, selected_fields, overwrite=False):
 
 # Generalized API endpoints - Replace with your actual (mock) API if demonstrating live calls.
 # These are placeholders and will not make real network requests in this sanitized version.
-GENERIC_LOGIN_API_URL = "https://api.example.com/auth/login" # Generic login endpoint
-GENERIC_UPDATE_API_URL = "https://api.example.com/records/update" # Generic update endpoint
+GENERIC_API_BASE_URL = "https://api.example.com"
+LOGIN_API_PATH = "/auth/login"
+UPDATE_API_PATH = "/records/update"
+BULK_UPDATE_API_PATH = "/records/bulk_update"
+GENERIC_LOGIN_API_URL = GENERIC_API_BASE_URL + LOGIN_API_PATH # Generic login endpoint
+GENERIC_UPDATE_API_URL = GENERIC_API_BASE_URL + UPDATE_API_PATH # Generic update endpoint
+GENERIC_BULK_UPDATE_API_URL = GENERIC_API_BASE_URL + BULK_UPDATE_API_PATH # Generic bulk update endpoint
+
+DEFAULT_LOG_FILE = "simulated_update_log.csv" # Renamed log file for generalization
+DEFAULT_CONCURRENCY = 8 # Maximum number of update requests in flight at once
+DEFAULT_CHUNK_SIZE = 5000 # Rows parsed per chunk when streaming the input file
+DEFAULT_BATCH_SIZE = 1 # Records per request; above 1 the bulk endpoint is used
+DEFAULT_BATCH_BYTES = 256 * 1024 # Upper bound on a bulk request body
+LOG_HEADERS = ["record_id", "response_code", "status", "details", # Standardized log headers
+               "latency_ms", "attempts", "timestamp"]
+LOG_FORMATS = ("csv", "jsonl", "parquet")
+
+# Adaptive rate control defaults (requests/sec)
+DEFAULT_INITIAL_RATE = 20.0
+DEFAULT_MAX_RATE = 1000.0
+
+# Retry policy for transient failures (429, 5xx, transport errors)
+DEFAULT_MAX_RETRIES = 4
+RETRY_BASE_DELAY = 0.5 # Seconds before the first retry (before jitter)
+RETRY_MAX_DELAY = 30.0 # Cap on any single backoff
+DEFAULT_REPLAY_FILE = "failed_records_replay.csv" # Records still failing after all retries
+DEFAULT_REJECTS_FILE = "rejected_records.csv" # Rows that failed FIELD_SCHEMA validation
+
+# Local state kept between runs (checkpoint journals, caches)
+STATE_DIR = Path.home() / ".cli_api"
+JOURNAL_DIR = STATE_DIR / "journals"
+CHANGE_CACHE_PATH = STATE_DIR / "change_cache.sqlite3"
+SESSION_CACHE_PATH = STATE_DIR / "sessions.json" # Cached session ids, readable by the owner only
+
+# Session lifetime handling
+DEFAULT_SESSION_TTL = 3600.0 # Assumed lifetime when the login response gives none
+SESSION_REFRESH_MARGIN = 60.0 # Log in again this many seconds before the session expires (at most half its lifetime)
+
+
+@dataclass
+class UpdateResult:
+    """Outcome of a single record update, as written to the update log."""
+    record_id: object
+    response_code: object
+    status: str
+    details: str
+    latency: float = 0.0 # Seconds spent waiting on the request
+    retry_after: float = None # Server-requested pause (Retry-After header), if any
+    attempts: int = 1
+    timestamp: float = field(default_factory=time.time) # When the (last) attempt finished
+
+    @property
+    def session_expired(self):
+        """True when the server refused the session id itself, so a fresh login should fix it."""
+        return self.response_code == 401
+
+    @property
+    def throttled(self):
+        """True when the server signalled overload (429, 5xx, transport error or Retry-After)."""
+        code = self.response_code
+        return (self.retry_after is not None or code == "ERROR"
+                or (isinstance(code, int) and (code == 429 or code >= 500)))
+
+    def as_row(self):
+        return [self.record_id, self.response_code, self.status, self.details,
+                round(self.latency * 1000, 1), self.attempts,
+                datetime.fromtimestamp(self.timestamp).isoformat(timespec="milliseconds")]
+
+    def as_record(self):
+        return dict(zip(LOG_HEADERS, self.as_row()))
+
+    @classmethod
+    def from_record(cls, record):
+        """Inverse of as_record(), for reading back a JSON Lines log."""
+        return cls(record["record_id"], record["response_code"], record["status"], record["details"],
+                   latency=record["latency_ms"] / 1000, attempts=record["attempts"],
+                   timestamp=datetime.fromisoformat(record["timestamp"]).timestamp())
+
+
+class AdaptiveRateController:
+    """
+    Token bucket whose refill rate adapts to the server using AIMD.
+
+    Responses are judged in windows of `window` results. A window with average latency
+    under `latency_target` and a 5xx/transport error share under `max_error_rate` raises
+    the rate by `increase_step` req/s; otherwise the rate is multiplied by
+    `decrease_factor`. A 429 or Retry-After cuts the rate immediately. Decreases happen at
+    most once per `cooldown` seconds, so one burst of rejections only counts once, and a
+    Retry-After also pauses all dispatch for the requested time.
+    """
+    def __init__(self, initial_rate=DEFAULT_INITIAL_RATE, min_rate=1.0, max_rate=DEFAULT_MAX_RATE,
+                 increase_step=10.0, decrease_factor=0.5, latency_target=2.0, max_error_rate=0.1,
+                 window=20, cooldown=1.0):
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.cooldown = cooldown
+        self.reason = "initial"
+        self._init_bucket(initial_rate)
+        self._latencies = deque(maxlen=window)
+        self._errors = 0 # 5xx/transport errors in the current window
+        self._lock = asyncio.Lock()
+
+    def _init_bucket(self, initial_rate):
+        self.rate = float(initial_rate)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = float("-inf")
+        self._paused_until = 0.0
+
+    @property
+    def burst(self):
+        """Bucket capacity: roughly 100ms worth of requests, never less than one."""
+        return max(1.0, self.rate / 10)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self):
+        """Waits until a request may be sent. Waiters are served in arrival order."""
+        async with self._lock:
+            while True:
+                wait = self._take(time.monotonic())
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    def _take(self, now):
+        """Takes a token if one is available (returns 0), else returns the seconds to wait."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def record(self, result):
+        """Feeds one UpdateResult back into the controller."""
+        now = time.monotonic()
+        if result.retry_after:
+            self._paused_until = max(self._paused_until, now + result.retry_after)
+        if result.retry_after is not None or result.response_code == 429:
+            cause = f"Retry-After {result.retry_after:g}s" if result.retry_after else "HTTP 429"
+            self._decrease(now, f"↓ {cause}")
+            return
+
+        self._latencies.append(result.latency)
+        if result.throttled: # 5xx or transport error
+            self._errors += 1
+        if len(self._latencies) < self.window:
+            return
+        average = sum(self._latencies) / len(self._latencies)
+        error_rate = self._errors / len(self._latencies)
+        if error_rate > self.max_error_rate:
+            self._decrease(now, f"↓ errors {error_rate:.0%}")
+        elif average > self.latency_target:
+            self._decrease(now, f"↓ latency {average:.2f}s")
+        else:
+            self._reset_window()
+            self._set_rate(self.rate + self.increase_step, "↑ healthy")
+
+    def _reset_window(self):
+        self._latencies.clear()
+        self._errors = 0
+
+    def _decrease(self, now, reason):
+        self._reset_window()
+        if now - self._last_decrease >= self.cooldown:
+            self._last_decrease = now
+            self._set_rate(self.rate * self.decrease_factor, reason)
+
+    def _set_rate(self, rate, reason):
+        new_rate = min(self.max_rate, max(self.min_rate, rate))
+        if new_rate != self.rate:
+            self._refill(time.monotonic()) # Settle tokens earned at the old rate
+            self.rate = new_rate
+            self.reason = reason
+
+    def postfix(self):
+        """Progress-bar postfix describing the current rate and why it last changed."""
+        return {"rate": f"{self.rate:.1f}/s", "why": self.reason}
+
+
+def _shared_slot(index):
+    return property(lambda self: self._state[index],
+                    lambda self, value: self._state.__setitem__(index, value))
+
+
+class SharedRateController(AdaptiveRateController):
+    """
+    AdaptiveRateController whose bucket (rate, tokens, pause) lives in shared memory, so
+    the worker processes of a sharded run draw from one global request budget and every
+    worker's AIMD adjustments apply to all of them. Create the state in the parent with
+    shared_state() and hand it to each worker process.
+    """
+    rate = _shared_slot(0)
+    _tokens = _shared_slot(1)
+    _last_refill = _shared_slot(2)
+    _last_decrease = _shared_slot(3)
+    _paused_until = _shared_slot(4)
+
+    def __init__(self, state, **kwargs):
+        self._state = state
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def shared_state(initial_rate=DEFAULT_INITIAL_RATE, context=None):
+        """Allocates the shared bucket (a lock-protected array of doubles) for a new run."""
+        import multiprocessing
+        context = context or multiprocessing.get_context()
+        return context.Array("d", [float(initial_rate), 1.0, time.monotonic(), float("-inf"), 0.0])
+
+    def _init_bucket(self, initial_rate):
+        pass # Initialised once by shared_state(), not by each worker
+
+    def _take(self, now):
+        with self._state.get_lock(): # Held only for the check, never across an await
+            return super()._take(now)
+
+    def record(self, result):
+        with self._state.get_lock():
+            super().record(result)
+
+
+class FairScheduler:
+    """
+    Shares `slots` in-flight requests among tenants. While slots are free any tenant may
+    take one; once they run out, each freed slot goes to the next waiting tenant in
+    round-robin order, one request per turn. A tenant with a huge workbook (and a long
+    line of waiting workers) therefore cannot starve the others.
+    """
+    def __init__(self, slots):
+        self.slots = max(1, int(slots))
+        self.in_use = 0
+        self._waiters = {} # Tenant -> deque of futures waiting for a slot
+        self._turns = deque() # Tenants with waiters, next turn first
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant):
+        await self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tenant):
+        if self.in_use < self.slots and not self._turns:
+            self.in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(tenant, deque())
+        if not queue:
+            self._turns.append(tenant)
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release() # The slot was handed over just as we were cancelled
+            raise
+
+    def release(self):
+        while self._turns:
+            tenant = self._turns.popleft()
+            queue = self._waiters[tenant]
+            waiter = queue.popleft()
+            if queue:
+                self._turns.append(tenant) # Back of the line for its next request
+            if not waiter.done(): # Skip waiters cancelled while queued
+                waiter.set_result(None)
+                return # The slot passes straight to the waiter
+        self.in_use -= 1
+
+
+def parse_retry_after(value):
+    """Returns a Retry-After header value in seconds, or None if absent or not numeric."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RunMetrics:
+    """
+    Instrumentation for one CLI run: request latency samples (for p50/p90/p99/max and a
+    Prometheus histogram), request counts by HTTP status, record outcomes, completions
+    per second, and time spent per phase (login, parsing, network, log writing).
+    Phases overlap while the pipeline runs, so their times do not add up to wall time.
+    """
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.latencies = array("d") # Seconds per HTTP call (single or bulk)
+        self.status_codes = Counter()
+        self.outcomes = Counter() # Final status per record
+        self.phases = Counter() # Phase name -> seconds
+        self._completions = Counter() # Whole seconds since start -> records completed
 
-async def login(username, password, customer_id):
+    @contextlib.contextmanager
+    def timer(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] += time.perf_counter() - started
+
+    def observe_request(self, result):
+        """Records one HTTP call (an UpdateResult for a single or bulk request)."""
+        self.latencies.append(result.latency)
+        self.status_codes[str(result.response_code)] += 1
+        self.phases["network"] += result.latency
+
+    def observe_record(self, result):
+        self.outcomes[result.status] += 1
+        self._completions[int(time.perf_counter() - self.started)] += 1
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def merge(self, other):
+        """Folds in the metrics of a shard worker process (same clock, so timelines line up)."""
+        self.latencies.extend(other.latencies)
+        self.status_codes.update(other.status_codes)
+        self.outcomes.update(other.outcomes)
+        self.phases.update(other.phases)
+        offset = int(round(other.started - self.started))
+        for second, count in other._completions.items():
+            self._completions[second + offset] += count
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        if not self.latencies:
+            return {}
+        ordered = sorted(self.latencies)
+        values = {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+        values[1.0] = ordered[-1]
+        return values
+
+    def throughput_timeline(self, windows=10):
+        """Records/sec in up to `windows` equal slices of the run."""
+        seconds = max(1, int(self.elapsed) + 1)
+        width = max(1, -(-seconds // windows)) # Ceiling division
+        return [sum(self._completions[t] for t in range(start, min(start + width, seconds))) / width
+                for start in range(0, seconds, width)]
+
+    def report(self):
+        records = sum(self.outcomes.values())
+        lines = ["", "📊 Run report",
+                 f"  Records: {records} in {self.elapsed:.1f}s ({records / self.elapsed if self.elapsed else 0:.1f} records/sec)",
+                 "  Outcomes: " + (", ".join(f"{k}={v}" for k, v in sorted(self.outcomes.items())) or "none")]
+        if self.latencies:
+            p = self.percentiles()
+            lines.append(f"  Request latency ({len(self.latencies)} calls): p50={p[0.5] * 1000:.1f}ms "
+                         f"p90={p[0.9] * 1000:.1f}ms p99={p[0.99] * 1000:.1f}ms max={p[1.0] * 1000:.1f}ms")
+            lines.append("  Responses by status: " + ", ".join(f"{k}={v}" for k, v in sorted(self.status_codes.items())))
+        lines.append("  Records/sec over time: " + " ".join(f"{rate:.0f}" for rate in self.throughput_timeline()))
+        lines.append("  Time by phase (overlapping): " + ", ".join(f"{k}={v:.2f}s" for k, v in sorted(self.phases.items())))
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="cli_api"):
+        """Renders the metrics in the Prometheus text exposition format."""
+        out = [f"# HELP {prefix}_request_latency_seconds Latency of update API calls.",
+               f"# TYPE {prefix}_request_latency_seconds histogram"]
+        ordered = sorted(self.latencies)
+        position = 0
+        for bound in self.LATENCY_BUCKETS:
+            while position < len(ordered) and ordered[position] <= bound:
+                position += 1
+            out.append(f'{prefix}_request_latency_seconds_bucket{{le="{bound}"}} {position}')
+        out.append(f'{prefix}_request_latency_seconds_bucket{{le="+Inf"}} {len(ordered)}')
+        out.append(f"{prefix}_request_latency_seconds_sum {sum(ordered)}")
+        out.append(f"{prefix}_request_latency_seconds_count {len(ordered)}")
+        out += [f"# HELP {prefix}_request_latency_quantile_seconds Latency quantiles for this run.",
+                f"# TYPE {prefix}_request_latency_quantile_seconds gauge"]
+        out += [f'{prefix}_request_latency_quantile_seconds{{quantile="{q}"}} {v}' for q, v in self.percentiles().items()]
+        out += [f"# HELP {prefix}_requests_total Update API calls by HTTP status.", f"# TYPE {prefix}_requests_total counter"]
+        out += [f'{prefix}_requests_total{{code="{k}"}} {v}' for k, v in sorted(self.status_codes.items())]
+        out += [f"# HELP {prefix}_records_total Records by final outcome.", f"# TYPE {prefix}_records_total counter"]
+        out += [f'{prefix}_records_total{{status="{k}"}} {v}' for k, v in sorted(self.outcomes.items())]
+        out += [f"# HELP {prefix}_phase_seconds Time spent per phase.", f"# TYPE {prefix}_phase_seconds gauge"]
+        out += [f'{prefix}_phase_seconds{{phase="{k}"}} {v}' for k, v in sorted(self.phases.items())]
+        records = sum(self.outcomes.values())
+        out += [f"# HELP {prefix}_run_seconds Wall-clock duration of the run.", f"# TYPE {prefix}_run_seconds gauge",
+                f"{prefix}_run_seconds {self.elapsed}",
+                f"# HELP {prefix}_records_per_second Average throughput of the run.",
+                f"# TYPE {prefix}_records_per_second gauge",
+                f"{prefix}_records_per_second {records / self.elapsed if self.elapsed else 0.0}"]
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path) # Atomic, for node_exporter's textfile collector
+
+
+def backoff_delay(attempt, retry_after=None, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Capped exponential backoff with full jitter, never shorter than a server Retry-After."""
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    return max(delay, retry_after or 0.0)
+
+
+async def login(username, password, customer_id, session=None, login_url=None):
     """
-    Simulates a login API call.
-    In a real scenario, this would authenticate against a real service
-    and return a session ID or token.
+    Logs in and returns (session_id, expires_in_seconds).
+    Without a login_url the call is simulated; otherwise credentials are POSTed to it
+    (e.g. the local mock_server.py) and the JSON response supplies the session id.
     """
+    if not (username and password and customer_id):
+        raise Exception("Login failed: Please provide username, password, and customer ID.")
+
+    if login_url:
+        logging.info(f"Logging in as {username} with customer ID: {customer_id}...")
+        body = {"username": username, "password": password, "customerId": customer_id}
+        async with session.post(login_url, json=body) as response:
+            if response.status >= 400:
+                raise Exception(f"Login failed with HTTP {response.status}: {await response.text()}")
+            data = await response.json(content_type=None)
+        if not isinstance(data, dict) or not data.get("sessionId"):
+            raise Exception("Login failed: response has no sessionId.")
+        return data["sessionId"], float(data.get("expires_in") or DEFAULT_SESSION_TTL)
+
     logging.info(f"Simulating login for user: {username} with customer ID: {customer_id}...")
     # Simulate network delay
     await asyncio.sleep(1)
 
     # For demonstration, let's say any non-empty username/password is "successful"
-    if username and password and customer_id:
-        # Simulate a session ID or token
-        simulated_session_id = f"mock_session_id_{hash(username + password + customer_id)}"
-        logging.info("✅ Login simulated successfully.")
-        return simulated_session_id
-    else:
-        raise Exception("Simulated login failed: Please provide username, password, and customer ID.")
+    # Simulate a session ID or token
+    simulated_session_id = f"mock_session_id_{hash(username + password + customer_id)}"
+    logging.info("✅ Login simulated successfully.")
+    return simulated_session_id, DEFAULT_SESSION_TTL
 
-def read_excel(file_path, selected_fields):
-    """Reads data from an Excel file for updates."""
-    try:
+
+_SESSION_CACHE_LOCK = threading.Lock() # Serializes session cache writes within this process
+
+
+@contextlib.contextmanager
+def session_cache_lock(cache_path):
+    """
+    Holds the session cache for a read-modify-write: a process-wide lock for threads,
+    plus an exclusive lock on a sidecar `.lock` file for other processes (shards,
+    concurrent runs). The file lock uses fcntl, or msvcrt on Windows.
+    """
+    with _SESSION_CACHE_LOCK:
+        fd = os.open(f"{cache_path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except ImportError:
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            yield
+        finally:
+            os.close(fd) # Closing the descriptor releases the file lock
+
+
+class SessionManager:
+    """
+    Hands out the current session id and keeps it valid for the whole run.
+
+    The session id is cached in SESSION_CACHE_PATH (mode 0600, keyed by login URL, user
+    and customer; the password is never stored) so later runs reuse it instead of logging
+    in again. get() logs in again shortly before the session expires, and refresh() is
+    called when the server rejects a session with 401. Both are single-flight: however
+    many requests notice at once, only one login is made and the rest wait for it.
+    """
+
+    def __init__(self, username, password, customer_id, session=None, login_url=None,
+                 cache_path=SESSION_CACHE_PATH, refresh_margin=SESSION_REFRESH_MARGIN, use_cache=True):
+        self.username = username
+        self.password = password
+        self.customer_id = customer_id
+        self.session = session
+        self.login_url = login_url
+        self.cache_path = Path(cache_path)
+        self.refresh_margin = refresh_margin
+        self.use_cache = use_cache
+        self.session_id = None
+        self.expires_at = 0.0 # Wall-clock time, so it stays meaningful across runs
+        self.lifetime = DEFAULT_SESSION_TTL # expires_in of the current session
+        self.logins = 0
+        self._lock = asyncio.Lock()
+        key = f"{login_url or GENERIC_LOGIN_API_URL}|{username}|{customer_id}"
+        self._cache_key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _fresh(self):
+        margin = min(self.refresh_margin, self.lifetime / 2) # Short-lived sessions would otherwise never count as fresh
+        return self.session_id is not None and time.time() < self.expires_at - margin
+
+    async def get(self):
+        """Returns a session id valid for at least refresh_margin (or half its lifetime) more seconds."""
+        if self._fresh():
+            return self.session_id
+        if self.session_id is None and self.use_cache:
+            self._load_cached()
+            if self._fresh():
+                logging.info("🔑 Reusing cached session.")
+                return self.session_id
+        return await self.refresh(stale=self.session_id)
+
+    async def refresh(self, stale=None):
+        """
+        Logs in again unless another caller already replaced `stale` (the session id
+        the caller saw fail). Returns the new session id.
+        """
+        async with self._lock:
+            if self.session_id != stale and self._fresh():
+                return self.session_id # Someone else refreshed while we waited
+            if stale is not None:
+                logging.info("🔑 Session expired or about to expire; logging in again.")
+            session_id, expires_in = await login(self.username, self.password, self.customer_id,
+                                                 session=self.session, login_url=self.login_url)
+            self.session_id, self.expires_at, self.lifetime = session_id, time.time() + expires_in, expires_in
+            self.logins += 1
+            if self.use_cache:
+                await asyncio.to_thread(self._save_cached)
+            return session_id
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _load_cached(self):
+        entry = self._read_cache().get(self._cache_key)
+        if isinstance(entry, dict) and entry.get("session_id"):
+            self.session_id = entry["session_id"]
+            self.expires_at = float(entry.get("expires_at", 0))
+            self.lifetime = float(entry.get("lifetime", DEFAULT_SESSION_TTL))
+
+    def _save_cached(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with session_cache_lock(self.cache_path): # Merge with entries other threads/processes just saved
+            now = time.time()
+            entries = {key: entry for key, entry in self._read_cache().items()
+                       if isinstance(entry, dict) and float(entry.get("expires_at", 0)) > now} # Drop expired sessions
+            entries[self._cache_key] = {"session_id": self.session_id, "expires_at": self.expires_at,
+                                        "lifetime": self.lifetime}
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, prefix=self.cache_path.name + ".",
+                                             suffix=".tmp") # Unique name and owner-only (0600) from the start
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(temp_path, self.cache_path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(temp_path)
+                raise
+
+
+async def current_session_id(session_id):
+    """Resolves a plain session id or a SessionManager to the session id to send now."""
+    if isinstance(session_id, SessionManager):
+        return await session_id.get()
+    return session_id
+
+
+def iter_frames(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields an Excel/CSV file as DataFrame chunks of up to `chunk_size` rows with normalized
+    headers. .xlsx files are streamed with openpyxl in read-only mode and CSVs with chunked
+    pandas reads, so memory stays flat however large the file is. Always yields at least
+    one (possibly empty) frame so the headers can be checked.
+    """
+    ext = Path(file_path).suffix.lower()
+    if ext == ".csv":
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk
+        return
+    if ext == ".xls": # Legacy format openpyxl cannot stream; read it whole and slice
         df = pd.read_excel(file_path)
-        df.columns = [str(col).strip() for col in df.columns] # Normalize headers
+        df.columns = [str(col).strip() for col in df.columns]
+        for start in range(0, max(len(df), 1), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
 
-        # Ensure a generic identifier column is present (e.g., 'equipment_id')
-        expected_cols = ['equipment_id'] + selected_fields
-        missing = [col for col in expected_cols if col not in df.columns]
-        if missing:
-            raise ValueError(f"❌ Missing required columns in Excel: {missing}. Expected: {expected_cols}")
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise pd.errors.EmptyDataError("No header row")
+        headers = [str(col).strip() for col in header]
+        buffer = []
+        yielded = False
+        for row in rows:
+            if any(cell is not None for cell in row): # Skip fully blank rows, as pd.read_excel does
+                buffer.append(row)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=headers)
+                buffer = []
+                yielded = True
+        if buffer or not yielded:
+            yield pd.DataFrame(buffer, columns=headers)
+    finally:
+        workbook.close()
 
-        logging.info(f"✅ Found {len(df)} records in Excel")
 
-        updates = {}
-        for _, row in df.iterrows():
-            equipment_id = row['equipment_id'] # Using 'equipment_id' as generic record identifier
-            # Use FIELD_MAP to convert human-readable names to simulated API field names
-            update_fields = {FIELD_MAP[f]: row[f] for f in selected_fields if pd.notna(row[f])}
-            if update_fields:
-                updates[equipment_id] = update_fields
+def check_columns(columns, selected_fields):
+    """Raises ValueError if 'equipment_id' or any selected field is missing from the headers."""
+    # Ensure a generic identifier column is present (e.g., 'equipment_id')
+    expected_cols = ['equipment_id'] + selected_fields
+    missing = [col for col in expected_cols if col not in columns]
+    if missing:
+        raise ValueError(f"❌ Missing required columns in Excel: {missing}. Expected: {expected_cols}")
 
-        return updates
+
+def build_payloads(frame, selected_fields):
+    """
+    Builds [(record_id, fields)] for one chunk, working a column at a time: each column's
+    null mask is computed in one vectorized call and only its non-null cells are copied
+    into the per-row payloads. Rows with no values left are dropped.
+    """
+    record_ids = frame['equipment_id'].tolist() # Using 'equipment_id' as generic record identifier
+    payloads = [{} for _ in record_ids]
+    for field in selected_fields:
+        column = frame[field]
+        mask = column.notna().to_numpy()
+        api_name = FIELD_MAP[field] # Convert human-readable names to simulated API field names
+        values = column[mask]
+        if "pattern" in FIELD_SCHEMA.get(field, {}):
+            values = pattern_text(values) # Send exactly the text the pattern was checked against
+        for i, value in zip(mask.nonzero()[0].tolist(), values.tolist()):
+            payloads[i][api_name] = value
+    return [(record_id, fields) for record_id, fields in zip(record_ids, payloads) if fields]
+
+
+def pattern_text(values):
+    """
+    Non-empty cells as the text pattern rules check and payloads send. A numeric column with
+    blanks reads as float, so whole-number floats become integers first: 123.0 is '123'.
+    """
+    if pd.api.types.is_float_dtype(values) and (values % 1 == 0).all() and (values.abs() < 2 ** 53).all():
+        values = values.astype("int64")
+    elif values.dtype == object or pd.api.types.is_float_dtype(values):
+        values = values.map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v)
+    return values.astype(str).str.strip()
+
+
+def invalid_cells(column, rule):
+    """
+    Returns a boolean mask of the non-empty cells in `column` that break `rule` (a
+    FIELD_SCHEMA entry). The checks are whole-column pandas operations.
+    """
+    present = column.notna()
+    bad = pd.Series(False, index=column.index)
+    kind = rule.get("type")
+    if kind == "date":
+        # Bare numbers are not dates (pd.to_datetime would read 45000 as nanoseconds after 1970)
+        if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+            numeric = present
+        elif column.dtype == object:
+            numeric = column.map(lambda v: isinstance(v, Number)).astype(bool)
+        else:
+            numeric = pd.Series(False, index=column.index)
+        bad |= present & numeric
+        column = column.where(~numeric)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning) # "Could not infer format" when the first value is bad
+            parsed = pd.to_datetime(column, errors="coerce") # Fast path: one inferred format for the column
+        retry = present & parsed.isna()
+        if retry.any(): # Mixed formats; parse only the leftovers element-wise
+            parsed[retry] = pd.to_datetime(column[retry].astype(str), errors="coerce", format="mixed")
+        bad |= present & ~numeric & parsed.isna()
+    elif kind in ("number", "integer"):
+        numbers = pd.to_numeric(column, errors="coerce")
+        bad |= present & numbers.isna()
+        if kind == "integer":
+            bad |= numbers.notna() & (numbers % 1 != 0)
+        if "min" in rule:
+            bad |= numbers < rule["min"]
+        if "max" in rule:
+            bad |= numbers > rule["max"]
+    if "pattern" in rule:
+        bad[present] |= ~pattern_text(column[present]).str.fullmatch(rule["pattern"])
+    return bad
+
+
+def describe_rule(rule):
+    """Short human-readable form of a FIELD_SCHEMA entry, used in reject reasons."""
+    kind = {"date": "a date", "number": "a number", "integer": "a whole number"}.get(rule.get("type"), "text")
+    if "min" in rule and "max" in rule:
+        kind += f" between {rule['min']} and {rule['max']}"
+    elif "min" in rule:
+        kind += f" >= {rule['min']}"
+    elif "max" in rule:
+        kind += f" <= {rule['max']}"
+    if "pattern" in rule:
+        kind += f" matching {rule['pattern']}"
+    return kind
+
+
+def validate_frame(frame, selected_fields, schema=FIELD_SCHEMA):
+    """
+    Checks every selected column against the schema, a column at a time.
+    Returns (valid_rows, rejected_rows); rejected_rows has an extra 'reason' column
+    naming each bad field and value.
+    """
+    reasons = None
+    for field in selected_fields:
+        rule = schema.get(field)
+        if not rule:
+            continue
+        bad = invalid_cells(frame[field], rule)
+        if not bad.any():
+            continue
+        if reasons is None:
+            reasons = pd.Series("", index=frame.index, dtype=object)
+        # Only the (few) bad cells are formatted as strings
+        message = frame.loc[bad, field].map(lambda value: f"{field}: {value!r} is not {describe_rule(rule)}; ")
+        reasons[bad] = reasons[bad] + message
+    if reasons is None:
+        return frame, frame.iloc[0:0]
+    rejected = reasons != ""
+    rejects = frame.loc[rejected, ['equipment_id'] + list(selected_fields)].copy()
+    rejects["reason"] = reasons[rejected].str.rstrip("; ")
+    return frame.loc[~rejected], rejects
+
+
+class RejectsWriter:
+    """
+    Collects rows that failed validation into a CSV with the input columns plus a
+    'reason' column, so they can be fixed and resubmitted. The file is only created
+    once a row is rejected.
+    """
+    def __init__(self, path, selected_fields):
+        self.path = path
+        self.columns = ['equipment_id'] + list(selected_fields) + ["reason"]
+        self.count = 0
+        self._file = None
+
+    def write(self, rejected):
+        if rejected.empty:
+            return
+        if self._file is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            csv.writer(self._file).writerow(self.columns)
+        rejected[self.columns].to_csv(self._file, header=False, index=False)
+        self._file.flush() # Rejects are on disk before this chunk's records are sent
+        self.count += len(rejected)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def stream_updates(file_path, selected_fields, chunk_size=DEFAULT_CHUNK_SIZE, rejects=None):
+    """
+    Yields batches of (record_id, fields) pairs as each chunk of the file is parsed.
+    With a RejectsWriter, each chunk is validated against FIELD_SCHEMA first and
+    rows that fail are written there instead of being sent.
+    """
+    try:
+        for frame in iter_frames(file_path, chunk_size):
+            check_columns(frame.columns, selected_fields)
+            if rejects is not None:
+                frame, rejected = validate_frame(frame, selected_fields)
+                rejects.write(rejected)
+            yield build_payloads(frame, selected_fields)
     except FileNotFoundError:
         raise FileNotFoundError(f"❌ Error: Excel file not found at '{file_path}'")
     except pd.errors.EmptyDataError:
         raise ValueError(f"❌ Error: Excel file at '{file_path}' is empty or has no valid data.")
+
+
+def read_excel(file_path, selected_fields):
+    """Reads data from an Excel file (or a CSV such as a replay file) into an updates dict."""
+    try:
+        updates = {}
+        for batch in stream_updates(file_path, selected_fields):
+            updates.update(batch)
+        logging.info(f"✅ Found {len(updates)} records with updates in Excel")
+        return updates
+    except (FileNotFoundError, ValueError):
+        raise
     except Exception as e:
         raise Exception(f"❌ Failed to read Excel file: {e}")
 
 
-async def update_record(session, base_url, session_id, record_id, fields, log_writer, dry_run=False):
+def read_header(file_path):
+    """Returns the normalized column names of an Excel/CSV file without reading its rows."""
+    try:
+        if Path(file_path).suffix.lower() == ".xlsx":
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True)
+            try:
+                header = next(workbook.active.iter_rows(max_row=1, values_only=True), None)
+            finally:
+                workbook.close()
+            if header is None:
+                raise pd.errors.EmptyDataError("No header row")
+            return [str(col).strip() for col in header]
+        reader = pd.read_csv if Path(file_path).suffix.lower() == ".csv" else pd.read_excel
+        return [str(col).strip() for col in reader(file_path, nrows=0).columns]
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ Error: Excel file not found at '{file_path}'")
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"❌ Error: Excel file at '{file_path}' is empty or has no valid data.")
+
+
+def estimate_rows(file_path):
+    """Cheap row-count estimate for the progress bar; None when it cannot be known up front."""
+    ext = Path(file_path).suffix.lower()
+    try:
+        if ext == ".csv":
+            with open(file_path, "rb") as f:
+                return max(0, sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1024 * 1024), b"")) - 1)
+        if ext == ".xlsx":
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True)
+            try:
+                max_row = workbook.active.max_row # From the sheet's stored dimensions
+            finally:
+                workbook.close()
+            return max_row - 1 if max_row else None
+    except Exception:
+        return None
+    return None
+
+
+def skip_completed(batches, completed_ids):
+    """Filters out records whose id is in completed_ids (a resumed run's journal)."""
+    skipped = 0
+    for batch in batches:
+        remaining = [(record_id, fields) for record_id, fields in batch if str(record_id) not in completed_ids]
+        skipped += len(batch) - len(remaining)
+        yield remaining
+    logging.info(f"⏩ Resume skipped {skipped} records already applied.")
+
+
+async def update_record(session, base_url, session_id, record_id, fields, dry_run=False, simulate=True):
     """
-    Simulates sending an update request for a single record to the API.
-    In a real scenario, this would make an actual API call.
+    Sends an update request for a single record to the API and returns its UpdateResult.
+    With simulate=True (the default) no request is made and the outcome is simulated;
+    otherwise the update is POSTed to base_url (e.g. the local mock_server.py).
     """
     # Parameters are generalized.
     params = {
@@ -191,10 +1051,27 @@ async def update_record(session, base_url, session_id, record_id, fields, log_wr
     if dry_run:
         status_message = f"✅ Dry run - simulated no update sent for record ID: {record_id}"
         logging.info(status_message)
-        log_writer.writerow([record_id, "DRY_RUN", "Success", status_message])
-        return
+        return UpdateResult(record_id, "DRY_RUN", "Success", status_message)
+
+    if not simulate:
+        params["id"] = str(record_id)
+        started = time.perf_counter()
+        try:
+            async with session.post(base_url, params=params) as response:
+                response_text = await response.text()
+                result = UpdateResult(record_id, response.status, "Success", response_text,
+                                      latency=time.perf_counter() - started,
+                                      retry_after=parse_retry_after(response.headers.get("Retry-After")))
+                if response.status >= 400:
+                    # Overload is worth retrying; any other 4xx is a permanent rejection of this record
+                    result.status = "Failed" if result.throttled else "Rejected"
+                return result
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return UpdateResult(record_id, "ERROR", "Failed", f"Request error: {e!r}",
+                                latency=time.perf_counter() - started)
 
     logging.info(f"Simulating update for record ID: {record_id} with fields: {fields}")
+    started = time.perf_counter()
     await asyncio.sleep(0.1) # Simulate a small network delay
 
     # Simulate success or failure (e.g., 90% success rate)
@@ -207,79 +1084,1326 @@ async def update_record(session, base_url, session_id, record_id, fields, log_wr
         simulated_response_text = "Simulated: Internal server error during update."
         result = "Failed"
 
-    log_writer.writerow([record_id, simulated_status_code, result, simulated_response_text])
+    return UpdateResult(record_id, simulated_status_code, result, simulated_response_text,
+                        latency=time.perf_counter() - started)
+
+
+async def update_with_retry(session, base_url, session_id, record_id, fields, dry_run=False, simulate=True,
+                            max_retries=DEFAULT_MAX_RETRIES, rate_controller=None, metrics=None):
+    """
+    Calls update_record, retrying transient failures (429, 5xx, transport errors) up to
+    max_retries times with jittered exponential backoff. Permanent 4xx rejections are
+    returned straight away. The returned UpdateResult records how many attempts were made.
+    When session_id is a SessionManager, a 401 triggers one re-login and an immediate retry.
+    """
+    attempt = 0
+    relogged = False
+    while True:
+        attempt += 1
+        if rate_controller and not dry_run:
+            await rate_controller.acquire()
+        sent_session = await current_session_id(session_id)
+        result = await update_record(session, base_url, sent_session, record_id, fields,
+                                     dry_run=dry_run, simulate=simulate)
+        result.attempts = attempt
+        if rate_controller and not dry_run:
+            rate_controller.record(result)
+        if metrics and not dry_run:
+            metrics.observe_request(result)
+        if result.session_expired and isinstance(session_id, SessionManager) and not relogged:
+            relogged = True
+            await session_id.refresh(stale=sent_session)
+            continue
+        if result.status != "Failed" or not result.throttled or attempt > max_retries:
+            return result
+        delay = backoff_delay(attempt, result.retry_after)
+        logging.debug(f"Retrying record ID {record_id} in {delay:.2f}s (attempt {attempt} got {result.response_code})")
+        await asyncio.sleep(delay)
+
+
+def bulk_entry(record_id, fields):
+    """One element of a bulk request body: the record id plus its fields, all as strings."""
+    entry = {k: str(v) for k, v in fields.items()}
+    entry["id"] = str(record_id)
+    return entry
+
+
+async def update_batch(session, bulk_url, session_id, records, simulate=True):
+    """
+    Sends several records to the bulk endpoint as one JSON array.
+
+    Returns (call_result, results): call_result is an UpdateResult describing the HTTP call
+    itself (used for rate control), and results holds one UpdateResult per record in
+    request order, or None when the batch failed as a whole and must be resent per record.
+    """
+    started = time.perf_counter()
+    if simulate:
+        logging.info(f"Simulating bulk update of {len(records)} records")
+        await asyncio.sleep(0.1) # Simulate one round-trip for the whole batch
+        ok = time.time() % 10 < 9 # Same variability as update_record
+        call_result = UpdateResult(None, 200 if ok else 500, "Success" if ok else "Failed",
+                                   "Simulated bulk update.", latency=time.perf_counter() - started)
+        if not ok:
+            return call_result, None
+        return call_result, [UpdateResult(record_id, 200, "Success", "Simulated: Record updated successfully.",
+                                           latency=call_result.latency) for record_id, _ in records]
+
+    params = {"sessionId": session_id, "record_type": "GenericRecordType", "useIds": "false"}
+    body = [bulk_entry(record_id, fields) for record_id, fields in records]
+    try:
+        async with session.post(bulk_url, params=params, json=body) as response:
+            latency = time.perf_counter() - started
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status >= 400:
+                text = await response.text()
+                return UpdateResult(None, response.status, "Failed", text, latency, retry_after), None
+            items = await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return UpdateResult(None, "ERROR", "Failed", f"Bulk request error: {e!r}",
+                            latency=time.perf_counter() - started), None
+
+    call_result = UpdateResult(None, response.status, "Success", "Bulk update.", latency=latency)
+    if (not isinstance(items, list) or len(items) != len(records)
+            or not all(isinstance(item, dict) and isinstance(item.get("status"), int) for item in items)):
+        call_result.status, call_result.details = "Failed", "Malformed bulk response."
+        return call_result, None
 
+    results = []
+    for (record_id, _), item in zip(records, items):
+        code = item["status"]
+        result = UpdateResult(record_id, code, "Success", str(item.get("message", "")), latency=latency)
+        if code >= 400:
+            result.status = "Failed" if result.throttled else "Rejected"
+        results.append(result)
+    return call_result, results
 
-async def send_updates(updates, session_id, dry_run=False):
-    """Initiates the process of sending bulk updates to the API."""
-    log_file = "simulated_update_log.csv" # Renamed log file for generalization
+
+async def update_group(session, base_url, bulk_url, session_id, records, dry_run=False, simulate=True,
+                       max_retries=DEFAULT_MAX_RETRIES, rate_controller=None, metrics=None):
+    """
+    Updates a group of (record_id, fields) pairs and returns one UpdateResult per record.
+    A single record goes through update_with_retry. Larger groups are sent to the bulk
+    endpoint. A batch that fails transiently (429, 5xx, transport error) is resent whole
+    with backoff, up to max_retries times; only a batch that fails for another reason
+    (malformed response, other 4xx) is resent one record at a time. Records that come
+    back from the batch with a transient failure are retried on their own.
+    session_id may be a plain session id or a SessionManager.
+    """
+    if len(records) == 1 or dry_run:
+        return [await update_with_retry(session, base_url, session_id, record_id, fields, dry_run=dry_run,
+                                        simulate=simulate, max_retries=max_retries, rate_controller=rate_controller,
+                                        metrics=metrics)
+                for record_id, fields in records]
+
+    attempt = 0
+    relogged = False
+    while True:
+        attempt += 1
+        if rate_controller:
+            await rate_controller.acquire()
+        sent_session = await current_session_id(session_id)
+        call_result, results = await update_batch(session, bulk_url, sent_session, records, simulate=simulate)
+        if rate_controller:
+            rate_controller.record(call_result)
+        if metrics:
+            metrics.observe_request(call_result)
+        if call_result.session_expired and isinstance(session_id, SessionManager) and not relogged:
+            relogged = True
+            await session_id.refresh(stale=sent_session)
+            continue
+        if results is not None or not call_result.throttled or attempt > max_retries:
+            break
+        # The server is overloaded: back off and resend the batch, not N single requests
+        delay = backoff_delay(attempt, call_result.retry_after)
+        logging.debug(f"Retrying bulk request of {len(records)} records in {delay:.2f}s "
+                      f"(attempt {attempt} got {call_result.response_code})")
+        await asyncio.sleep(delay)
+
+    if results is None and call_result.throttled:
+        logging.warning(f"⚠️ Bulk request still failing after {attempt} attempts ({call_result.response_code}); "
+                        f"{len(records)} records left for the replay file.")
+        return [UpdateResult(record_id, call_result.response_code, "Failed", call_result.details,
+                             call_result.latency, call_result.retry_after, attempts=attempt)
+                for record_id, _ in records]
+    if results is None:
+        logging.warning(f"⚠️ Bulk request failed ({call_result.response_code}); resending {len(records)} records individually.")
+        results = [None] * len(records)
+
+    for i, (record_id, fields) in enumerate(records):
+        if results[i] is None or (results[i].status == "Failed" and results[i].throttled):
+            results[i] = await update_with_retry(session, base_url, session_id, record_id, fields,
+                                                 simulate=simulate, max_retries=max_retries,
+                                                 rate_controller=rate_controller, metrics=metrics)
+    return results
+
+
+class ResultSink:
+    """
+    Buffered, asynchronous writer for the update log.
+
+    submit() only appends to an in-memory buffer, so it never blocks the event loop. A
+    background task drains the buffer in batches (every `flush_every` results or
+    `flush_interval` seconds) and writes each batch on a worker thread. The only
+    backpressure is wait_for_room(), which pauses callers while more than `max_pending`
+    results are waiting to be written.
+    Supports CSV, JSON Lines and Parquet (Parquet needs pyarrow).
+    """
+    def __init__(self, path, fmt=None, flush_every=1000, flush_interval=0.5, max_pending=50000):
+        self.path = str(path)
+        suffix = Path(self.path).suffix.lstrip(".").lower()
+        self.fmt = fmt or (suffix if suffix in LOG_FORMATS else "csv")
+        if self.fmt not in LOG_FORMATS:
+            raise ValueError(f"Unsupported log format '{self.fmt}'. Use one of: {', '.join(LOG_FORMATS)}")
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rows_written = 0
+        self.write_seconds = 0.0 # Time spent in the writer thread
+        self._buffer = []
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self._closing = False
+        self._task = None
+        self._file = None
+        self._writer = None
+
+    async def __aenter__(self):
+        await asyncio.to_thread(self._open)
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def submit(self, result):
+        self._buffer.append(result)
+        if len(self._buffer) >= self.flush_every:
+            self._wake.set()
+
+    async def wait_for_room(self):
+        while len(self._buffer) >= self.max_pending:
+            self._wake.set()
+            self._room.clear()
+            await self._room.wait()
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+            await asyncio.to_thread(self._close)
+
+    async def _run(self):
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            if self._buffer:
+                batch, self._buffer = self._buffer, []
+                self._room.set()
+                await asyncio.to_thread(self._write, batch)
+            elif self._closing:
+                return
+
+    def _open(self):
+        if self.fmt == "parquet":
+            try:
+                import pyarrow # noqa: F401 - only checking availability up front
+            except ImportError:
+                raise ImportError("Parquet logs need pyarrow: pip install pyarrow")
+            return # The writer is created with the first batch, once the schema is known
+        self._file = open(self.path, "w", newline="", encoding="utf-8") # Added encoding for robustness
+        if self.fmt == "csv":
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(LOG_HEADERS)
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        if self.fmt == "csv":
+            self._writer.writerows(result.as_row() for result in batch)
+        elif self.fmt == "jsonl":
+            self._file.write("".join(json.dumps(result.as_record(), default=str) + "\n" for result in batch))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            columns = {name: [] for name in LOG_HEADERS}
+            for result in batch:
+                for name, value in zip(LOG_HEADERS, result.as_row()):
+                    columns[name].append(value)
+            for name in ("record_id", "response_code", "details"): # Mixed types in the source data
+                columns[name] = [str(value) for value in columns[name]]
+            table = pa.table(columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self.rows_written += len(batch)
+        self.write_seconds += time.perf_counter() - started
+
+    def _close(self):
+        if self.fmt == "parquet" and self._writer is not None:
+            self._writer.close()
+        if self._file:
+            self._file.close()
+
+
+class ReplayWriter:
+    """
+    Writes records that are still failing to a file with the same columns as the
+    read_excel input ('equipment_id' plus the human-readable field names), so it can be
+    passed straight back to the CLI. The file is only created once a failure occurs.
+    """
+    def __init__(self, path, selected_fields):
+        self.path = path
+        self.selected_fields = list(selected_fields)
+        self.count = 0
+        self._api_to_field = {FIELD_MAP[f]: f for f in self.selected_fields}
+        self._file = None
+        self._writer = None
+
+    def write(self, record_id, fields):
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["equipment_id"] + self.selected_fields)
+        values = {self._api_to_field[k]: v for k, v in fields.items() if k in self._api_to_field}
+        self._writer.writerow([record_id] + [values.get(f, "") for f in self.selected_fields])
+        self.count += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Streams a file through SHA-256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of the record ids already applied for one input file.
+
+    Journals are keyed by the input file's SHA-256 together with the customer id and the
+    selected fields (plus an optional scope), so a resumed run only trusts entries written
+    for the same workbook sent to the same customer with the same fields. Ids are appended as they succeed and flushed with
+    an fsync every `sync_every` entries or `sync_interval` seconds, whichever comes first,
+    so a crash loses at most one batch (those records are simply sent again on resume).
+    """
+    def __init__(self, path, sync_every=500, sync_interval=1.0):
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def for_input(cls, input_path, journal_dir=JOURNAL_DIR, scope="", customer_id=None, fields=(), **kwargs):
+        """
+        Journal for an input file sent to `customer_id` with `fields`; `scope` (e.g. a tenant)
+        further separates runs of the same file. A run with another customer or field selection
+        gets a different journal, so --resume never skips records it has not sent itself.
+        """
+        run_key = json.dumps([str(scope), str(customer_id), sorted(fields)])
+        name = file_sha256(input_path) + "_" + hashlib.sha256(run_key.encode("utf-8")).hexdigest()[:16]
+        return cls(Path(journal_dir) / f"{name}.journal", **kwargs)
+
+    def load(self):
+        """Returns the set of completed record ids (as strings). A torn final line is ignored."""
+        if not self.path.exists():
+            return set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = f.read()
+        lines = data.split("\n")
+        lines.pop() # Either '' after the final newline, or a partial line from a crash
+        return set(lines)
+
+    def open(self, resume=False):
+        """Opens the journal for appending; a fresh (non-resume) run starts it empty."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._drop_torn_tail()
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        return self
+
+    def _drop_torn_tail(self):
+        """Truncates a partial final line left by a crash, so later appends start on a clean line."""
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            tail_start = max(0, size - 4096)
+            f.seek(tail_start)
+            tail = f.read()
+            if tail and not tail.endswith(b"\n"):
+                f.truncate(tail_start + tail.rfind(b"\n") + 1)
+
+    def append(self, record_id):
+        self._file.write(f"{record_id}\n")
+        self._pending += 1
+        if self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._file and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class ChangeCache:
+    """
+    Persistent SQLite store of the last value successfully applied for each
+    (record_id, API field), scoped per customer. drop_unchanged() diffs a batch against
+    it so fields the server already holds are not sent again.
+
+    Lookups run on the parsing thread and writes on the event loop, so the connection
+    is shared behind a lock. Writes are committed in batches of `commit_every`.
+    """
+    def __init__(self, path=CHANGE_CACHE_PATH, scope="", commit_every=1000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.scope = str(scope)
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS applied ("
+            " scope TEXT NOT NULL, record_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,"
+            " updated_at REAL NOT NULL, PRIMARY KEY (scope, record_id, field)) WITHOUT ROWID")
+        self._conn.commit()
+
+    def drop_unchanged(self, batch):
+        """Returns (changed_batch, fields_dropped); records left with no changes are removed."""
+        record_ids = list({str(record_id) for record_id, _ in batch})
+        known = {}
+        with self._lock:
+            for start in range(0, len(record_ids), 500): # Stay under SQLite's bound-parameter limit
+                chunk = record_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT record_id, field, value FROM applied WHERE scope = ? AND record_id IN ({','.join('?' * len(chunk))})",
+                    [self.scope, *chunk])
+                known.update(((record_id, field), value) for record_id, field, value in rows)
+        changed_batch = []
+        dropped = 0
+        for record_id, fields in batch:
+            key = str(record_id)
+            changed = {k: v for k, v in fields.items() if known.get((key, k)) != str(v)}
+            dropped += len(fields) - len(changed)
+            if changed:
+                changed_batch.append((record_id, changed))
+        return changed_batch, dropped
+
+    def record(self, record_id, fields):
+        """Remembers fields as applied for record_id (call only after a successful update)."""
+        now = time.time()
+        self._pending.extend((self.scope, str(record_id), k, str(v), now) for k, v in fields.items())
+        if len(self._pending) >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._conn.executemany("INSERT OR REPLACE INTO applied VALUES (?, ?, ?, ?, ?)", self._pending)
+                self._conn.commit()
+                self._pending = []
+
+    def clear(self):
+        """Invalidates every cached value for this scope."""
+        with self._lock:
+            self._pending = []
+            deleted = self._conn.execute("DELETE FROM applied WHERE scope = ?", (self.scope,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def drop_unchanged(batches, cache):
+    """Pipeline stage: diffs each batch against the ChangeCache before dispatch."""
+    seen = sent = fields_dropped = 0
+    for batch in batches:
+        changed_batch, dropped = cache.drop_unchanged(batch)
+        seen += len(batch)
+        sent += len(changed_batch)
+        fields_dropped += dropped
+        yield changed_batch
+    logging.info(f"🗃️ Change cache: {seen - sent} of {seen} records unchanged and skipped, "
+                 f"{fields_dropped} unchanged fields dropped.")
+
+
+async def send_updates(updates, session_id, dry_run=False, concurrency=DEFAULT_CONCURRENCY,
+                       base_url=GENERIC_UPDATE_API_URL, simulate=True, log_file=DEFAULT_LOG_FILE,
+                       rate_controller=None, max_retries=DEFAULT_MAX_RETRIES, replay_file=DEFAULT_REPLAY_FILE,
+                       selected_fields=None, journal=None, total=None, change_cache=None,
+                       batch_size=DEFAULT_BATCH_SIZE, batch_bytes=DEFAULT_BATCH_BYTES,
+                       bulk_url=GENERIC_BULK_UPDATE_API_URL, log_format=None, metrics=None, session=None,
+                       show_progress=True, scheduler=None, tenant=None, progress_position=None):
+    """
+    Initiates the process of sending bulk updates to the API.
+
+    `updates` is either a {record_id: fields} dict or an iterable of batches of
+    (record_id, fields) pairs such as stream_updates() yields. Batches are pulled on a
+    worker thread, so the first requests go out while the rest of the file is parsed;
+    `total` (if known) sizes the progress bar. `session_id` may be a SessionManager, which
+    keeps the session valid for runs that outlive it.
+
+    Records are dispatched by a fixed pool of `concurrency` worker tasks pulling from a
+    shared queue, so at most that many requests are in flight at once. Results are written
+    to the log in input order, whatever order the requests complete in.
+    An optional AdaptiveRateController paces dispatch to what the server can sustain;
+    its rate and last adjustment are shown in the progress bar.
+    Results go to `log_file` through a ResultSink (CSV, JSONL or Parquet, by `log_format`
+    or the file suffix), so disk writes never stall in-flight requests.
+    Transient failures are retried (see update_with_retry); records that still fail are
+    written to `replay_file` so a follow-up run only resends those. Successful record ids
+    are appended to the optional CheckpointJournal so an interrupted run can be resumed,
+    and the values they applied are stored in the optional ChangeCache.
+    With batch_size > 1, records are grouped (up to batch_size records and batch_bytes of
+    JSON) into bulk requests; see update_group for the per-record fallback.
+    An optional RunMetrics collects latency, status and per-phase timings. Pass an open
+    aiohttp `session` to reuse one connection pool across several calls.
+    With a FairScheduler, each request also waits for one of the scheduler's slots, which
+    are shared fairly with the other tenants' concurrent send_updates calls.
+    Returns a summary dict with the record count, elapsed seconds and records/sec; its
+    "error" is set when the run stopped early (login, log file or request failure).
+    """
+    concurrency = max(1, int(concurrency))
+    batch_size = max(1, int(batch_size))
+    if isinstance(updates, Mapping):
+        total = len(updates)
+        updates = [list(updates.items())]
+    batches = iter(updates)
+    queue = asyncio.Queue(maxsize=concurrency * 2) # Items are groups of (index, record_id, fields)
+    completed = {} # index -> (UpdateResult, fields) for records that finished ahead of their turn
+    max_ahead = max(1024, concurrency * 64, batch_size * 4) # Bounds `completed` when one record is slow
+    advanced = asyncio.Event()
+    next_index = 0
+    started = time.perf_counter()
+    replay = ReplayWriter(replay_file, selected_fields or list(FIELD_MAP))
+
+    async def produce():
+        index = 0
+        group, group_bytes = [], 0
+        while True:
+            parse_started = time.perf_counter()
+            parsing = asyncio.ensure_future(asyncio.to_thread(next, batches, None)) # Parse off the event loop
+            try:
+                batch = await asyncio.shield(parsing)
+            except asyncio.CancelledError:
+                await asyncio.wait([parsing]) # Never leave the parser running once the caller tears down
+                raise
+            if metrics:
+                metrics.phases["parse"] += time.perf_counter() - parse_started
+            if batch is None:
+                break
+            for record_id, fields in batch:
+                size = len(json.dumps(bulk_entry(record_id, fields))) + 1 if batch_size > 1 else 0
+                if group and (len(group) >= batch_size or group_bytes + size > batch_bytes):
+                    await queue.put(group)
+                    group, group_bytes = [], 0
+                while index - next_index >= max_ahead:
+                    if group: # Never hold back records the ordered log is waiting for
+                        await queue.put(group)
+                        group, group_bytes = [], 0
+                    advanced.clear()
+                    await advanced.wait()
+                group.append((index, record_id, fields))
+                group_bytes += size
+                index += 1
+        if group:
+            await queue.put(group)
+        for _ in range(concurrency):
+            await queue.put(None) # One stop signal per worker
+
+    def write_in_order(sink):
+        nonlocal next_index
+        advanced.set()
+        while next_index in completed:
+            result, fields = completed.pop(next_index)
+            sink.submit(result)
+            if metrics:
+                metrics.observe_record(result)
+            if result.status == "Failed":
+                replay.write(result.record_id, fields)
+            next_index += 1
+
+    async def work(session, sink, progress):
+        while True:
+            group = await queue.get()
+            if group is None:
+                return
+            records = [(record_id, fields) for _, record_id, fields in group]
+            async with scheduler.slot(tenant) if scheduler else contextlib.nullcontext():
+                results = await update_group(session, base_url, bulk_url, session_id, records, dry_run=dry_run,
+                                             simulate=simulate, max_retries=max_retries,
+                                             rate_controller=rate_controller, metrics=metrics)
+            if rate_controller and not dry_run:
+                progress.set_postfix(rate_controller.postfix(), refresh=False)
+            for (index, record_id, fields), result in zip(group, results):
+                if not dry_run and result.status == "Success":
+                    if journal:
+                        journal.append(record_id)
+                    if change_cache:
+                        change_cache.record(record_id, fields)
+                completed[index] = (result, fields)
+            write_in_order(sink)
+            progress.update(len(group))
+            await sink.wait_for_room()
+
+    sink = None
+    error = None
     try:
-        with open(log_file, "w", newline="", encoding='utf-8') as f: # Added encoding for robustness
-            writer = csv.writer(f)
-            # Standardized log headers
-            writer.writerow(["record_id", "response_code", "status", "details"])
-            async with aiohttp.ClientSession() as session:
-                for record_id, fields in tqdm(updates.items(), desc="🚚 Sending simulated updates"):
-                    await update_record(session, GENERIC_UPDATE_API_URL, session_id, record_id, fields, writer, dry_run=dry_run)
+        async with ResultSink(log_file, log_format) as sink:
+            from tqdm.asyncio import tqdm
+            async with contextlib.AsyncExitStack() as stack:
+                if session is None:
+                    session = await stack.enter_async_context(
+                        aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)))
+                desc = "🚚 Sending simulated updates" + (f" [{tenant}]" if tenant else "")
+                with tqdm(total=total, desc=desc, disable=not show_progress, position=progress_position) as progress:
+                    tasks = [asyncio.create_task(produce())] # The producer goes first, so it is cancelled too
+                    tasks += [asyncio.create_task(work(session, sink, progress)) for _ in range(concurrency)]
+                    try:
+                        await asyncio.gather(*tasks)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                        await asyncio.gather(*tasks, return_exceptions=True) # Let them unwind before the caller closes the journal
 
         logging.info(f"🧾 Simulated update log saved to: {log_file}")
     except Exception as e:
         logging.error(f"❌ Failed to write log file or send updates: {e}")
+        error = str(e) or type(e).__name__
+    finally:
+        replay.close()
+        if metrics and sink:
+            metrics.phases["log_write"] += sink.write_seconds
 
+    if replay.count:
+        logging.warning(f"🔁 {replay.count} records still failing after retries. Re-run with: --input {replay_file}")
 
-async def main():
-    """Main function to run the CLI tool."""
-    # Replaced hardcoded 'cust_id' with user input
-    login_name, password, cust_id = prompt_credentials()
+    elapsed = time.perf_counter() - started
+    return {"records": next_index, "elapsed": elapsed, "records_per_sec": next_index / elapsed if elapsed else 0.0,
+            "error": error}
+
+
+def api_urls(api_url):
+    """Returns (simulate, update_url, bulk_url) for --api-url (None means simulated calls)."""
+    if api_url is None:
+        return True, GENERIC_UPDATE_API_URL, GENERIC_BULK_UPDATE_API_URL
+    return False, api_url.rstrip("/") + UPDATE_API_PATH, api_url.rstrip("/") + BULK_UPDATE_API_PATH
 
-    selected_fields = prompt_field_selection()
 
-    # Prompt for generating template
-    if prompt_generate_template(selected_fields):
-        template_path = get_default_template_path()
-        overwrite = input("⚠️ Overwrite if file exists? (y/n): ").lower() == "y"
-        create_excel_template(template_path, selected_fields, overwrite=overwrite)
-        # You might choose to exit here if template generation is the primary task
-        # return
+def attach_run_state(updates, file_path, args, cust_id, dry_run, selected_fields, clear_cache=False, journal_scope=""):
+    """
+    Wraps `updates` with --resume skipping and change-cache filtering for one input file.
+    Returns (updates, journal, change_cache); the last two are None in a dry run.
+    """
+    if dry_run:
+        return updates, None, None
+
+    journal = CheckpointJournal.for_input(file_path, scope=journal_scope, customer_id=cust_id, fields=selected_fields)
+    done = journal.load()
+    if args.resume:
+        updates = skip_completed(updates, done)
+    elif done:
+        logging.warning(f"⚠️ {len(done)} records were applied by an earlier run of this file. "
+                        "Pass --resume to skip them; starting a fresh checkpoint journal.")
+    journal.open(resume=args.resume)
+
+    change_cache = ChangeCache(scope=cust_id)
+    if clear_cache:
+        logging.info(f"🗑️ Cleared {change_cache.clear()} cached values for customer '{cust_id}'.")
+    if not args.no_cache:
+        updates = drop_unchanged(updates, change_cache)
+    return updates, journal, change_cache
+
 
-    dry_run = input("🔎 Dry run (no updates sent)? (y/n): ").lower() == "y"
+# --- Sharded execution (process pool) ---
 
-    session_id = None
+SHARD_SEQ_COLUMN = "_seq" # Position of the row in the original input, carried through the shard files
+
+
+def shard_of(record_ids, shards):
+    """Shard number for each record id. Stable across runs, so --resume sees the same shard files."""
+    return pd.util.hash_pandas_object(record_ids.astype(str), index=False).to_numpy() % shards
+
+
+def split_into_shards(file_path, selected_fields, shards, out_dir, rejects=None):
+    """
+    Streams the input into `shards` CSV files by record id hash, tagging each row with its
+    input position (SHARD_SEQ_COLUMN). Rows failing validation go to `rejects` instead.
+    Returns (shard_paths, rows_per_shard).
+    """
+    paths = [os.path.join(out_dir, f"shard_{i:03d}.csv") for i in range(shards)]
+    counts = [0] * shards
+    columns = [SHARD_SEQ_COLUMN, 'equipment_id'] + list(selected_fields)
+    files = [open(path, "w", newline="", encoding="utf-8") for path in paths]
+    seq = 0
     try:
-        # Calls the simulated login function
-        session_id = await login(login_name, password, cust_id)
-        logging.info("✅ Logged in successfully (Simulated).")
-    except Exception as e:
-        logging.error(f"❌ Login failed: {e}")
-        return # Exit if login fails
+        for f in files:
+            csv.writer(f).writerow(columns)
+        for frame in iter_frames(file_path):
+            check_columns(frame.columns, selected_fields)
+            frame = frame.assign(**{SHARD_SEQ_COLUMN: range(seq, seq + len(frame))})
+            seq += len(frame)
+            if rejects is not None:
+                frame, rejected = validate_frame(frame, selected_fields)
+                rejects.write(rejected)
+            assignment = shard_of(frame['equipment_id'], shards)
+            for i, f in enumerate(files):
+                part = frame.loc[assignment == i, columns]
+                if len(part):
+                    part.to_csv(f, header=False, index=False)
+                    counts[i] += len(part)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ Error: Excel file not found at '{file_path}'")
+    finally:
+        for f in files:
+            f.close()
+    return paths, counts
+
+
+_shard_rate_state = None # Shared bucket for this worker process, set by _init_shard_worker
 
-    file_path = prompt_excel_path()
 
-    updates = {}
+def _init_shard_worker(rate_state):
+    global _shard_rate_state
+    _shard_rate_state = rate_state
+    logging.getLogger().setLevel(logging.ERROR) # The parent reports merged results; per-shard logs would drown them
+
+
+def run_shard(spec):
+    """Process-pool entry point: sends one shard file from this process's own event loop."""
+    return asyncio.run(_run_shard(**spec))
+
+
+async def _run_shard(shard_path, log_path, replay_path, args, selected_fields, cust_id, auth, dry_run):
+    metrics = RunMetrics()
+    rate_controller = None
+    if _shard_rate_state is not None:
+        rate_controller = SharedRateController(_shard_rate_state, max_rate=args.max_rate)
+    updates = stream_updates(shard_path, selected_fields) # Already validated by the parent
+    updates, journal, change_cache = attach_run_state(updates, shard_path, args, cust_id, dry_run, selected_fields)
+    simulate, update_url, bulk_url = api_urls(args.api_url)
     try:
-        updates = read_excel(file_path, selected_fields)
-        if not updates:
-            logging.warning("⚠️ No updates to process. Check your Excel data.")
-            return
-        logging.info(f"📦 Prepared {len(updates)} records for simulated update.")
-    except FileNotFoundError as e:
-        logging.error(f"{e}")
+        connector = aiohttp.TCPConnector(limit=max(1, args.concurrency))
+        async with aiohttp.ClientSession(connector=connector) as http_session:
+            # The parent owns the session cache; shards refreshing at once must not race to rewrite it
+            session_manager = SessionManager(auth["username"], auth["password"], cust_id, session=http_session,
+                                             login_url=auth["login_url"], use_cache=False)
+            session_manager.session_id, session_manager.expires_at = auth["session_id"], auth["expires_at"]
+            session_manager.lifetime = auth["lifetime"]
+            summary = await send_updates(updates, session_manager, dry_run=dry_run, concurrency=args.concurrency,
+                                         base_url=update_url, simulate=simulate, log_file=log_path,
+                                         rate_controller=rate_controller, max_retries=args.max_retries,
+                                         replay_file=replay_path, selected_fields=selected_fields, journal=journal,
+                                         change_cache=change_cache, batch_size=args.batch_size,
+                                         batch_bytes=args.batch_bytes, bulk_url=bulk_url, log_format="jsonl",
+                                         metrics=metrics, session=http_session, show_progress=False)
+    finally:
+        if journal:
+            journal.close()
+        if change_cache:
+            change_cache.close()
+    metrics.finish()
+    summary["metrics"] = metrics
+    return summary
+
+
+def read_shard_log(shard_path, log_path):
+    """
+    Yields (seq, UpdateResult) for each row of a shard's JSON Lines log. The log is in
+    shard order but may skip rows (resumed, unchanged or empty), so each row's input
+    position is looked up by record id in an index of the shard file. A repeated id takes
+    its positions in order. Rows whose id is missing from the shard file come last and are reported.
+    """
+    if not os.path.exists(log_path):
         return
-    except ValueError as e:
+    positions = {} # Record id (as the worker logged it) -> its input positions, in shard order
+    for chunk in pd.read_csv(shard_path, usecols=[SHARD_SEQ_COLUMN, 'equipment_id'], chunksize=DEFAULT_CHUNK_SIZE):
+        # Read the ids the same way the worker did, so they compare equal as strings
+        for seq, record_id in zip(chunk[SHARD_SEQ_COLUMN].tolist(), chunk['equipment_id'].tolist()):
+            positions.setdefault(str(record_id), deque()).append(seq)
+    unmatched = [] # Held back so this stream stays sorted for heapq.merge
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            seqs = positions.get(str(record["record_id"]))
+            if seqs:
+                yield seqs.popleft(), UpdateResult.from_record(record)
+            else:
+                unmatched.append(UpdateResult.from_record(record))
+    if unmatched:
+        logging.warning(f"⚠️ {len(unmatched)} log rows in {Path(log_path).name} did not match a row of their shard; "
+                        "they are placed at the end of the merged log.")
+    for result in unmatched:
+        yield sys.maxsize, result
+
+
+async def merge_shard_logs(shard_logs, log_file, log_format=None, chunk_size=10000):
+    """K-way merges the per-shard logs by input position into one log. Returns the row count."""
+    merged = heapq.merge(*(read_shard_log(shard_path, log_path) for shard_path, log_path in shard_logs),
+                         key=lambda item: item[0])
+    async with ResultSink(log_file, log_format) as sink:
+        while True:
+            chunk = await asyncio.to_thread(list, itertools.islice(merged, chunk_size))
+            if not chunk:
+                break
+            for _, result in chunk:
+                sink.submit(result)
+            await sink.wait_for_room()
+    return sink.rows_written
+
+
+def concat_replay_files(paths, replay_file):
+    """Joins per-shard replay files (same header) into one. Returns the number of records."""
+    count = 0
+    out = None
+    try:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                header = f.readline()
+                if out is None:
+                    out = open(replay_file, "w", newline="", encoding="utf-8")
+                    out.write(header)
+                for line in f:
+                    out.write(line)
+                    count += 1
+    finally:
+        if out:
+            out.close()
+    return count
+
+
+async def process_file_sharded(file_path, args, selected_fields, cust_id, session_manager, dry_run, metrics,
+                               log_file, replay_file, rejects_file):
+    """
+    Sends one input file with --shards worker processes. The parent streams the input into
+    per-shard CSVs by record id hash; each worker runs its own event loop and connection
+    pool over one shard, drawing from a shared SharedRateController budget. The per-shard
+    logs are then merged back into input order. Returns False if it could not be processed.
+    """
+    logging.info(f"📄 Processing: {file_path} ({args.shards} shards)")
+    try:
+        with metrics.timer("parse"):
+            check_columns(read_header(file_path), selected_fields) # Fail fast, before anything is sent
+    except (FileNotFoundError, ValueError) as e:
         logging.error(f"{e}")
-        return
+        return False
     except Exception as e:
         logging.error(f"❌ An unexpected error occurred while reading Excel: {e}")
-        return
+        return False
+
+    if Path(replay_file).resolve() == Path(file_path).resolve():
+        replay_file = str(Path(file_path).with_name(f"{Path(file_path).stem}_remaining.csv"))
+
+    if args.clear_cache and not dry_run: # Once here, not in every worker
+        change_cache = ChangeCache(scope=cust_id)
+        logging.info(f"🗑️ Cleared {change_cache.clear()} cached values for customer '{cust_id}'.")
+        change_cache.close()
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    context = multiprocessing.get_context("spawn") # Fresh interpreters: no inherited event loop or threads
+    rate_state = None
+    if not args.no_rate_control:
+        rate_state = SharedRateController.shared_state(args.initial_rate, context)
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="cli_api_shards_") as shard_dir:
+        rejects = None if args.no_validate else RejectsWriter(rejects_file, selected_fields)
+        try:
+            with metrics.timer("parse"):
+                paths, counts = await asyncio.to_thread(split_into_shards, file_path, selected_fields,
+                                                        args.shards, shard_dir, rejects)
+        finally:
+            if rejects:
+                rejects.close()
+        logging.info(f"🧩 Split {sum(counts)} rows into {args.shards} shards: {counts}")
+
+        session_id = await session_manager.get()
+        auth = {"username": session_manager.username, "password": session_manager.password,
+                "login_url": session_manager.login_url, "session_id": session_id,
+                "expires_at": session_manager.expires_at, "lifetime": session_manager.lifetime}
+        specs = [{"shard_path": path, "log_path": f"{path}.log.jsonl", "replay_path": f"{path}.replay.csv",
+                  "args": args, "selected_fields": selected_fields, "cust_id": cust_id, "auth": auth,
+                  "dry_run": dry_run}
+                 for path in paths]
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=args.shards, mp_context=context,
+                                 initializer=_init_shard_worker, initargs=(rate_state,)) as pool:
+            summaries = await asyncio.gather(*(loop.run_in_executor(pool, run_shard, spec) for spec in specs),
+                                             return_exceptions=True)
+        shard_errors = []
+        for number, summary in enumerate(summaries):
+            if isinstance(summary, BaseException):
+                summary = {"error": str(summary) or type(summary).__name__}
+            else:
+                metrics.merge(summary["metrics"])
+            if summary["error"]:
+                shard_errors.append(f"shard {number}: {summary['error']}")
+
+        with metrics.timer("log_write"):
+            rows = await merge_shard_logs([(spec["shard_path"], spec["log_path"]) for spec in specs],
+                                          log_file, args.log_format)
+        logging.info(f"🧾 Simulated update log saved to: {log_file}")
+        replayed = concat_replay_files([spec["replay_path"] for spec in specs], replay_file)
+
+    if rejects and rejects.count:
+        logging.warning(f"🚫 {rejects.count} rows failed validation and were not sent. See: {rejects_file}")
+    if replayed:
+        logging.warning(f"🔁 {replayed} records still failing after retries. Re-run with: --input {replay_file}")
+    if shard_errors: # The merged log still holds whatever the other shards sent
+        logging.error(f"❌ {file_path}: {len(shard_errors)} of {args.shards} shards stopped early: {shard_errors}")
+        return False
+    logging.info(f"✅ {file_path}: {rows} records in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+INPUT_SUFFIXES = (".xlsx", ".xls", ".csv")
+PASSWORD_ENV_VAR = "CLI_API_PASSWORD"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk record update CLI (simulated API).")
+    parser.add_argument("inputs", nargs="*",
+                        help="Excel/CSV files or directories of them, processed in order in one session.")
+    parser.add_argument("--config", default=None,
+                        help="JSON file of option values (keys are option names, e.g. \"batch_size\"). "
+                             "Command-line options override it.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Non-interactive mode: never prompt, fail if a required setting is missing.")
+    parser.add_argument("--username", default=None, help="API username.")
+    parser.add_argument("--customer-id", default=None, help="Customer ID to log in with.")
+    parser.add_argument("--fields", default=None,
+                        help="Comma-separated field names or list numbers to update, e.g. \"License Plate,GVW\".")
+    parser.add_argument("--dry-run", action="store_true", help="Simulate the run without sending updates.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum number of update requests in flight (default: {DEFAULT_CONCURRENCY}).")
+    parser.add_argument("--api-url", default=None,
+                        help="Base URL of a live API (e.g. http://127.0.0.1:8080 for mock_server.py). "
+                             "Updates are simulated when omitted.")
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE,
+                        help="Path of the update log. With several inputs, each gets its own log named after it.")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default=None,
+                        help="Update log format; inferred from the --log-file suffix when omitted (Parquet needs pyarrow).")
+    parser.add_argument("--initial-rate", type=float, default=DEFAULT_INITIAL_RATE,
+                        help=f"Starting request rate (req/s) for adaptive rate control (default: {DEFAULT_INITIAL_RATE:g}).")
+    parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE,
+                        help=f"Upper bound for the adaptive request rate (default: {DEFAULT_MAX_RATE:g}).")
+    parser.add_argument("--no-rate-control", action="store_true",
+                        help="Disable adaptive rate control and send as fast as --concurrency allows.")
+    parser.add_argument("--input", default=None,
+                        help="Excel/CSV file to process, e.g. a replay file from a previous run. Prompted for if omitted.")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"Retries per record for 429/5xx/network errors (default: {DEFAULT_MAX_RETRIES}).")
+    parser.add_argument("--replay-file", default=DEFAULT_REPLAY_FILE,
+                        help="Where records still failing after retries are written, in input format.")
+    parser.add_argument("--rejects-file", default=DEFAULT_REJECTS_FILE,
+                        help="Where rows failing type/format validation are written, with a 'reason' column.")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Send rows as they are, without checking them against FIELD_SCHEMA first.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip records already applied by an earlier, interrupted run of the same input file.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Records per request. Above 1, records are grouped into bulk (JSON array) requests.")
+    parser.add_argument("--batch-bytes", type=int, default=DEFAULT_BATCH_BYTES,
+                        help=f"Maximum JSON body size of a bulk request (default: {DEFAULT_BATCH_BYTES}).")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Also write the end-of-run metrics to this file in Prometheus text format.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Send every field even if the change cache says the server already has it.")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Invalidate the change cache for this customer before sending.")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Split each input by record id across this many worker processes, each with its own "
+                             "event loop, connection pool and --concurrency, sharing one rate budget.")
+    parser.add_argument("--customer-column", default=None,
+                        help="Multi-tenant mode: column of the input holding each row's customer ID. Each customer "
+                             "gets its own login, log files and --tenant-concurrency, and all run at once.")
+    parser.add_argument("--tenant", action="append", default=[], metavar="CUSTOMER=FILE",
+                        help="Multi-tenant mode: send FILE as customer CUSTOMER. Repeat for each workbook.")
+    parser.add_argument("--tenant-concurrency", type=int, default=None,
+                        help="Requests in flight per customer in multi-tenant mode (default: --concurrency). "
+                             "--concurrency caps the total, shared round-robin between customers.")
+    parser.add_argument("--no-session-cache", action="store_true",
+                        help="Always log in fresh instead of reusing a session cached by an earlier run.")
+    return parser
+
+
+def parse_args(argv=None):
+    """
+    Parses command-line options, layered over an optional --config JSON file.
+    Anything still missing is prompted for interactively unless --batch is given.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        try:
+            with open(args.config, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"Cannot read config file '{args.config}': {e}")
+        password = config.pop("password", None) # Not an option, so take it out before the unknown-key check
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"Unknown keys in config file: {unknown}")
+        parser.set_defaults(**config)
+        args = parser.parse_args(argv) # Re-parse so explicit options win over the config file
+        args.config_password = password
+    return args
+
+
+def collect_inputs(paths):
+    """Expands the given files and directories into the list of input files to process."""
+    files = []
+    for path in paths:
+        path = Path(sanitize_path(str(path)))
+        if path.is_dir():
+            files.extend(sorted(p for p in path.iterdir()
+                                if p.suffix.lower() in INPUT_SUFFIXES and not p.name.startswith("~$"))) # Skip Office lock files
+        else:
+            files.append(path)
+    return [str(f) for f in files]
+
+
+def parse_field_selection(value):
+    """Turns '--fields' (names or 1-based list numbers, comma-separated or a list) into field names."""
+    items = value if isinstance(value, list) else str(value).split(",")
+    names = list(FIELD_MAP.keys())
+    selected = []
+    for item in (str(i).strip() for i in items):
+        if not item:
+            continue
+        if item.isdigit() and 1 <= int(item) <= len(names):
+            selected.append(names[int(item) - 1])
+        elif item in FIELD_MAP:
+            selected.append(item)
+        else:
+            raise ValueError(f"Unknown field '{item}'.")
+    if not selected:
+        raise ValueError("No valid fields selected.")
+    return selected
+
+
+def output_path_for(base, file_path, several):
+    """Per-input output name: the base path itself for one input, '<base>_<input stem>' for several."""
+    if not several:
+        return base
+    base = Path(base)
+    return str(base.with_name(f"{base.stem}_{Path(file_path).stem}{base.suffix}"))
+
+
+async def process_file(file_path, args, selected_fields, cust_id, session_id, dry_run, http_session,
+                       rate_controller, metrics, log_file, replay_file, rejects_file, tenant=None,
+                       scheduler=None, concurrency=None, progress_position=None):
+    """
+    Streams one input file through the update pipeline. Returns False if it could not be processed.
+    In multi-tenant runs `tenant` names the customer the file belongs to, and requests take
+    their slots from the shared FairScheduler.
+    """
+    logging.info(f"📄 Processing: {file_path}" + (f" for customer '{tenant}'" if tenant else ""))
+    try:
+        with metrics.timer("parse"):
+            check_columns(read_header(file_path), selected_fields) # Fail fast, before anything is sent
+    except (FileNotFoundError, ValueError) as e:
+        logging.error(f"{e}")
+        return False
+    except Exception as e:
+        logging.error(f"❌ An unexpected error occurred while reading Excel: {e}")
+        return False
+
+    # Rows are parsed and validated in chunks and handed to the sender as they are ready
+    rejects = None if args.no_validate else RejectsWriter(rejects_file, selected_fields)
+    updates = stream_updates(file_path, selected_fields, rejects=rejects)
+    with metrics.timer("parse"):
+        total = estimate_rows(file_path)
+    if total is not None:
+        logging.info(f"📦 About {total} rows to process for simulated update.")
+
+    if Path(replay_file).resolve() == Path(file_path).resolve():
+        # Never overwrite the file that is still being streamed in
+        replay_file = str(Path(file_path).with_name(f"{Path(file_path).stem}_remaining.csv"))
+
+    updates, journal, change_cache = attach_run_state(updates, file_path, args, cust_id, dry_run, selected_fields,
+                                                      clear_cache=args.clear_cache, journal_scope=tenant or "")
 
     # Sends updates using the simulated update functions
-    await send_updates(updates, session_id, dry_run=dry_run)
+    simulate, update_url, bulk_url = api_urls(args.api_url)
+    try:
+        summary = await send_updates(updates, session_id, dry_run=dry_run, concurrency=concurrency or args.concurrency,
+                                     base_url=update_url, simulate=simulate, log_file=log_file,
+                                     rate_controller=rate_controller, max_retries=args.max_retries,
+                                     replay_file=replay_file, selected_fields=selected_fields, journal=journal,
+                                     total=total, change_cache=change_cache, batch_size=args.batch_size,
+                                     batch_bytes=args.batch_bytes, bulk_url=bulk_url, log_format=args.log_format,
+                                     metrics=metrics, session=http_session, scheduler=scheduler, tenant=tenant,
+                                     progress_position=progress_position)
+    finally:
+        if journal:
+            journal.close() # Also runs on Ctrl+C, so completed ids are on disk for --resume
+        if change_cache:
+            change_cache.close()
+        if rejects:
+            rejects.close()
+    if rejects and rejects.count:
+        logging.warning(f"🚫 {rejects.count} rows failed validation and were not sent. See: {rejects_file}")
+    if summary["error"]:
+        logging.error(f"❌ {file_path}: stopped after {summary['records']} records: {summary['error']}")
+        return False
+    logging.info(f"✅ {file_path}: {summary['records']} records in {summary['elapsed']:.1f}s")
+    return True
+
+
+def split_by_tenant(file_path, column, out_dir):
+    """
+    Streams a workbook with a customer-ID column into one CSV per customer, keeping the
+    row order. Rows without a customer ID are skipped. Returns ({customer: path}, skipped).
+    """
+    paths, files, skipped = {}, {}, 0
+    try:
+        for frame in iter_frames(file_path):
+            if column not in frame.columns:
+                raise ValueError(f"❌ Missing customer column '{column}' in {file_path}.")
+            customers = frame[column].astype("string").str.strip()
+            skipped += int(customers.isna().sum() + (customers == "").sum())
+            for customer, part in frame.groupby(customers, sort=False):
+                if not customer:
+                    continue
+                if customer not in files:
+                    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in customer)
+                    paths[customer] = os.path.join(out_dir, f"{Path(file_path).stem}_{len(files):03d}_{safe}.csv")
+                    files[customer] = open(paths[customer], "w", newline="", encoding="utf-8")
+                    part.to_csv(files[customer], index=False)
+                else:
+                    part.to_csv(files[customer], header=False, index=False)
+    finally:
+        for f in files.values():
+            f.close()
+    return paths, skipped
+
+
+def parse_tenant_map(values):
+    """Turns repeated 'CUSTOMER=FILE' options into [(customer, file)]."""
+    pairs = []
+    for value in values:
+        customer, sep, path = str(value).partition("=")
+        if not sep or not customer.strip() or not path.strip():
+            raise ValueError(f"Expected CUSTOMER=FILE, got '{value}'.")
+        pairs.append((customer.strip(), sanitize_path(path)))
+    return pairs
+
+
+def tenant_output_path(base, tenant, file_path, several_files):
+    """Per-tenant output name: '<base>_<customer>', plus the input stem when there are several inputs."""
+    base = Path(base)
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(tenant))
+    middle = f"_{Path(file_path).stem}" if several_files else ""
+    return str(base.with_name(f"{base.stem}{middle}_{safe}{base.suffix}"))
+
+
+async def run_tenants(jobs, args, selected_fields, login_name, password, dry_run, http_session, rate_controller,
+                      metrics, login_url):
+    """
+    Multi-tenant run: `jobs` is a list of (customer, file to send, source input). Each
+    customer gets its own SessionManager and logs and at most --tenant-concurrency requests
+    in flight, and all customers run concurrently, sharing the --concurrency slots through
+    a FairScheduler. Returns the list of failed (customer, source input) pairs.
+    """
+    by_tenant = {}
+    for customer, file_path, source in jobs:
+        by_tenant.setdefault(customer, []).append((file_path, source))
+    several_files = len({source for _, _, source in jobs}) > 1
+    scheduler = FairScheduler(args.concurrency)
+    tenant_concurrency = args.tenant_concurrency or args.concurrency
+    failed = []
+
+    async def run_tenant(position, customer, files):
+        manager = SessionManager(login_name, password, customer, session=http_session, login_url=login_url,
+                                 use_cache=not args.no_session_cache)
+        try:
+            with metrics.timer("login"):
+                await manager.get()
+        except Exception as e:
+            logging.error(f"❌ Login failed for customer '{customer}': {e}")
+            failed.extend((customer, source) for _, source in files)
+            return
+        for file_path, source in files: # One file at a time per customer, so its limit holds
+            outputs = {name: tenant_output_path(getattr(args, name), customer, source, several_files)
+                       for name in ("log_file", "replay_file", "rejects_file")}
+            ok = await process_file(file_path, args, selected_fields, customer, manager, dry_run, http_session,
+                                    rate_controller, metrics, tenant=customer, scheduler=scheduler,
+                                    concurrency=tenant_concurrency, progress_position=position, **outputs)
+            if not ok:
+                failed.append((customer, source))
+
+    logging.info(f"👥 Sending for {len(by_tenant)} customers at once: {', '.join(by_tenant)}")
+    await asyncio.gather(*(run_tenant(i, customer, files) for i, (customer, files) in enumerate(by_tenant.items())))
+    return failed
+
+
+async def main(args=None):
+    """
+    Main function to run the CLI tool. Returns True when every input was processed.
+
+    All inputs share one login, one aiohttp connection pool and one rate controller, so
+    login, pool warm-up and interpreter startup are paid once per job, not once per file.
+    """
+    args = args or parse_args()
+    interactive = not args.batch
+
+    # Replaced hardcoded 'cust_id' with user input
+    multi_tenant = bool(args.customer_column or args.tenant)
+    if multi_tenant and args.shards > 1:
+        logging.error("❌ --shards cannot be combined with multi-tenant mode (--customer-column/--tenant).")
+        return False
+    password = os.environ.get(PASSWORD_ENV_VAR) or getattr(args, "config_password", None)
+    if args.username and password and (args.customer_id or multi_tenant):
+        login_name, cust_id = args.username, args.customer_id
+    elif interactive:
+        login_name, password, cust_id = prompt_credentials(ask_customer_id=not multi_tenant)
+    else:
+        logging.error(f"❌ Batch mode needs --username, --customer-id (unless customers come from the input) "
+                      f"and the {PASSWORD_ENV_VAR} environment variable.")
+        return False
+    try:
+        tenant_files = parse_tenant_map(args.tenant)
+    except ValueError as e:
+        logging.error(f"❌ Invalid --tenant: {e}")
+        return False
+
+    if args.fields:
+        try:
+            selected_fields = parse_field_selection(args.fields)
+        except ValueError as e:
+            logging.error(f"❌ Invalid --fields: {e}")
+            return False
+    elif interactive:
+        selected_fields = prompt_field_selection()
+    else:
+        logging.error("❌ Batch mode needs --fields.")
+        return False
+
+    if interactive:
+        # Prompt for generating template
+        if prompt_generate_template(selected_fields):
+            template_path = get_default_template_path()
+            overwrite = input("⚠️ Overwrite if file exists? (y/n): ").lower() == "y"
+            create_excel_template(template_path, selected_fields, overwrite=overwrite)
+            # You might choose to exit here if template generation is the primary task
+            # return
+
+    dry_run = args.dry_run
+    if interactive and not dry_run:
+        dry_run = input("🔎 Dry run (no updates sent)? (y/n): ").lower() == "y"
+
+    files = collect_inputs(args.inputs + ([args.input] if args.input else []))
+    if not files and not tenant_files and interactive:
+        files = [prompt_excel_path()]
+    if not files and not tenant_files:
+        logging.error("❌ No input files given.")
+        return False
+    if multi_tenant and files and not args.customer_column:
+        logging.error("❌ Inputs not given with --tenant need --customer-column to say which customer each row is for.")
+        return False
+
+    metrics = RunMetrics()
+    rate_controller = None
+    if not args.no_rate_control:
+        rate_controller = AdaptiveRateController(initial_rate=args.initial_rate, max_rate=args.max_rate)
+
+    several = len(files) > 1
+    failed_files = []
+    try:
+        connector = aiohttp.TCPConnector(limit=max(1, args.concurrency))
+        async with contextlib.AsyncExitStack() as stack:
+            http_session = await stack.enter_async_context(aiohttp.ClientSession(connector=connector))
+            login_url = args.api_url.rstrip("/") + LOGIN_API_PATH if args.api_url else None
+            if multi_tenant:
+                jobs = [(customer, path, path) for customer, path in tenant_files]
+                split_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="cli_api_tenants_"))
+                for file_path in files:
+                    try:
+                        with metrics.timer("parse"):
+                            paths, skipped = await asyncio.to_thread(split_by_tenant, file_path,
+                                                                     args.customer_column, split_dir)
+                    except (FileNotFoundError, ValueError) as e:
+                        logging.error(f"{e}")
+                        failed_files.append(file_path)
+                        continue
+                    if skipped:
+                        logging.warning(f"⚠️ {skipped} rows in {file_path} have no customer ID and were skipped.")
+                    jobs += [(customer, path, file_path) for customer, path in paths.items()]
+                failed = await run_tenants(jobs, args, selected_fields, login_name, password, dry_run,
+                                           http_session, rate_controller, metrics, login_url)
+                failed_files += [f"{source} ({customer})" for customer, source in failed]
+                files = files + [path for _, path in tenant_files] # For the summary below
+            else:
+                session_manager = SessionManager(login_name, password, cust_id, session=http_session,
+                                                 login_url=login_url, use_cache=not args.no_session_cache)
+                try:
+                    # Reuses a cached session when one is still valid, otherwise logs in
+                    with metrics.timer("login"):
+                        await session_manager.get()
+                    logging.info("✅ Logged in successfully.")
+                except Exception as e:
+                    logging.error(f"❌ Login failed: {e}")
+                    return False # Exit if login fails
+
+                for file_path in files:
+                    outputs = {"log_file": output_path_for(args.log_file, file_path, several),
+                               "replay_file": output_path_for(args.replay_file, file_path, several),
+                               "rejects_file": output_path_for(args.rejects_file, file_path, several)}
+                    if args.shards > 1:
+                        ok = await process_file_sharded(file_path, args, selected_fields, cust_id, session_manager,
+                                                        dry_run, metrics, **outputs)
+                    else:
+                        ok = await process_file(file_path, args, selected_fields, cust_id, session_manager, dry_run,
+                                                http_session, rate_controller, metrics, **outputs)
+                    if not ok:
+                        failed_files.append(file_path)
+    finally:
+        metrics.finish()
+        print(metrics.report())
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+            logging.info(f"📈 Metrics written to: {args.metrics_file}")
+
+    if failed_files:
+        logging.error(f"❌ {len(failed_files)} of {len(files)} input files could not be processed: {failed_files}")
     logging.info("Operation complete.")
+    return not failed_files
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if not asyncio.run(main()):
+            sys.exit(1)
     except KeyboardInterrupt:
         logging.info("\n👋 Operation cancelled by user.")
     except Exception as e:
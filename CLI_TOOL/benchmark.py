@@ -0,0 +1,174 @@
+"""
+Throughput benchmark for CLI_API.send_updates.
+
+Starts mock_server.py in-process and sends a synthetic workbook's worth of updates
+at several concurrency levels, reporting records/sec for each. --batch-size compares
+the bulk endpoint against single-record requests, and --shards runs the CLI's sharded
+process-pool mode at each given process count instead.
+
+    python benchmark.py --records 2000 --concurrency 1 8 32 128
+    python benchmark.py --records 20000 --concurrency 8 --batch-size 100
+    python benchmark.py --records 50000 --concurrency 32 --shards 1 2 4 8
+
+--startup instead checks how long `import CLI_API` takes (via `python -X importtime`)
+against IMPORT_BUDGET_MS, and that no heavy dependency is loaded at import time. It exits
+non-zero on a regression, so it can gate CI.
+
+    python benchmark.py --startup
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import CLI_API
+from mock_server import create_app, start_server
+
+
+IMPORT_BUDGET_MS = 150 # Upper bound for `import CLI_API` (about 50ms when measured, on a cold-ish cache)
+LAZY_MODULES = ("pandas", "aiohttp", "tqdm", "openpyxl", "pyarrow") # Must only load when a code path needs them
+
+
+def measure_import(module="CLI_API", runs=5):
+    """
+    Imports `module` in fresh interpreters with -X importtime. Returns (best cumulative ms,
+    {imported module: self ms} from the best run).
+    """
+    best_ms, best_modules = None, {}
+    here = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                   cwd=here, capture_output=True, text=True, check=True)
+        modules = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        total_ms = modules[module][1] / 1000
+        if best_ms is None or total_ms < best_ms:
+            best_ms, best_modules = total_ms, {name: times[0] / 1000 for name, times in modules.items()}
+    return best_ms, best_modules
+
+
+def check_startup(budget_ms=IMPORT_BUDGET_MS):
+    """Prints the import profile of CLI_API. Returns False if it is over budget or loads a heavy module."""
+    total_ms, modules = measure_import()
+    print(f"\nimport CLI_API: {total_ms:.1f}ms (budget {budget_ms}ms)")
+    for name, self_ms in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:8]:
+        print(f"{self_ms:>10.1f}ms  {name}")
+    eager = sorted({name.split(".")[0] for name in modules} & set(LAZY_MODULES))
+    if eager:
+        print(f"❌ Loaded at import time but should be lazy: {', '.join(eager)}")
+    if total_ms > budget_ms:
+        print(f"❌ Over the import-time budget by {total_ms - budget_ms:.1f}ms")
+    return not eager and total_ms <= budget_ms
+
+
+def synthetic_updates(count):
+    """Builds an updates dict shaped like read_excel's output."""
+    return {
+        f"EQ-{i:06d}": {
+            CLI_API.FIELD_MAP["License Plate"]: f"PLATE{i}",
+            CLI_API.FIELD_MAP["Engine Make"]: "DemoMake",
+        }
+        for i in range(count)
+    }
+
+
+async def run_benchmark(records, levels, latency, capacity=None, adaptive=False, batch_size=1):
+    app = create_app(latency=latency, capacity=capacity)
+    runner, base_url = await start_server(app)
+    updates = synthetic_updates(records)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for concurrency in levels:
+                throttled_before = app["throttled"]
+                controller = CLI_API.AdaptiveRateController() if adaptive else None
+                summary = await CLI_API.send_updates(
+                    updates, "benchmark_session", concurrency=concurrency,
+                    base_url=base_url + CLI_API.UPDATE_API_PATH, simulate=False,
+                    log_file=os.path.join(tmp, f"log_c{concurrency}.csv"), rate_controller=controller,
+                    batch_size=batch_size, bulk_url=base_url + CLI_API.BULK_UPDATE_API_PATH)
+                summary["throttled"] = app["throttled"] - throttled_before
+                results.append((concurrency, summary))
+    finally:
+        await runner.cleanup()
+    return results
+
+
+async def run_sharded_benchmark(records, shard_levels, concurrency, latency, capacity=None, batch_size=1):
+    """Runs process_file_sharded over a synthetic CSV at each shard count. Returns [(shards, summary)]."""
+    app = create_app(latency=latency, capacity=capacity)
+    runner, base_url = await start_server(app)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "input.csv")
+            updates = synthetic_updates(records)
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write("equipment_id,License Plate,Engine Make\n")
+                f.writelines(f"{record_id},{fields[CLI_API.FIELD_MAP['License Plate']]},DemoMake\n"
+                             for record_id, fields in updates.items())
+            for shards in shard_levels:
+                args = CLI_API.build_parser().parse_args([
+                    "--api-url", base_url, "--shards", str(shards), "--concurrency", str(concurrency),
+                    "--batch-size", str(batch_size), "--no-rate-control", "--no-cache", "--no-session-cache",
+                    "--log-file", os.path.join(tmp, f"log_s{shards}.csv")])
+                throttled_before = app["throttled"]
+                async with CLI_API.aiohttp.ClientSession() as http_session:
+                    manager = CLI_API.SessionManager("benchmark", "benchmark", "benchmark", session=http_session,
+                                                     login_url=base_url + CLI_API.LOGIN_API_PATH, use_cache=False)
+                    metrics = CLI_API.RunMetrics()
+                    await CLI_API.process_file_sharded(input_path, args, ["License Plate", "Engine Make"], "benchmark",
+                                                       manager, False, metrics, args.log_file, args.replay_file,
+                                                       args.rejects_file)
+                metrics.finish()
+                records_done = sum(metrics.outcomes.values())
+                results.append((shards, {"records": records_done, "elapsed": metrics.elapsed,
+                                         "records_per_sec": records_done / metrics.elapsed,
+                                         "throttled": app["throttled"] - throttled_before}))
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI_API.send_updates against the local mock server.")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock server response delay in seconds.")
+    parser.add_argument("--capacity", type=float, default=None, help="Mock server updates/sec limit (429 above it).")
+    parser.add_argument("--adaptive", action="store_true", help="Pace requests with AdaptiveRateController.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Records per request (above 1 uses the bulk endpoint).")
+    parser.add_argument("--shards", type=int, nargs="+", default=None,
+                        help="Benchmark sharded mode at these process counts (uses the first --concurrency per process).")
+    parser.add_argument("--startup", action="store_true",
+                        help=f"Check `import CLI_API` time against the {IMPORT_BUDGET_MS}ms budget and exit.")
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(0 if check_startup() else 1)
+
+    logging.getLogger().setLevel(logging.WARNING) # Keep per-record logging out of the timings
+    if args.shards:
+        results = asyncio.run(run_sharded_benchmark(args.records, args.shards, args.concurrency[0], args.latency,
+                                                    args.capacity, args.batch_size))
+        label = "shards"
+    else:
+        results = asyncio.run(run_benchmark(args.records, args.concurrency, args.latency, args.capacity, args.adaptive,
+                                            args.batch_size))
+        label = "concurrency"
+
+    print(f"\n{label:>12} {'records':>8} {'seconds':>8} {'records/sec':>12} {'429s':>6}")
+    for level, summary in results:
+        print(f"{level:>12} {summary['records']:>8} {summary['elapsed']:>8.2f} "
+              f"{summary['records_per_sec']:>12.1f} {summary['throttled']:>6}")
+
+
+if __name__ == "__main__":
+    main()
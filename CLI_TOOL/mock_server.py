@@ -0,0 +1,141 @@
+"""
+Local stand-in for the generic record API used by CLI_API.py.
+
+Serves the login, single-record update and bulk update endpoints with a configurable response latency, failure
+rate and capacity, so the CLI and benchmark.py can be exercised without any real backend.
+Requests beyond `capacity` per second are answered with 429 and a Retry-After header.
+With `session_ttl` set, only session ids issued by the login endpoint are accepted, and
+they expire after that many seconds (401), so session refresh can be exercised too.
+
+    python mock_server.py --port 8080 --latency 0.05
+    python CLI_API.py --api-url http://127.0.0.1:8080
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import deque
+
+from aiohttp import web
+
+# Endpoint paths mirror the placeholders in CLI_API.py
+LOGIN_PATH = "/auth/login"
+UPDATE_PATH = "/records/update"
+BULK_UPDATE_PATH = "/records/bulk_update"
+
+
+def create_app(latency=0.05, failure_rate=0.0, capacity=None, per_record_latency=0.0002, session_ttl=None):
+    """
+    Builds the mock API application. capacity=None means unlimited requests/sec.
+    A bulk request costs `latency` plus `per_record_latency` for each record it carries.
+    session_ttl=None accepts any non-empty sessionId.
+    """
+    app = web.Application()
+    app["latency"] = latency
+    app["failure_rate"] = failure_rate
+    app["capacity"] = capacity
+    app["per_record_latency"] = per_record_latency
+    app["updates_received"] = 0
+    app["requests_received"] = 0
+    app["throttled"] = 0
+    app["session_ttl"] = session_ttl
+    app["logins"] = 0
+    sessions = {} # Issued session id -> expiry (monotonic time)
+    recent = deque() # Arrival times of updates within the last second
+
+    def over_capacity():
+        if not app["capacity"]:
+            return False
+        now = time.monotonic()
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        recent.append(now)
+        return len(recent) > app["capacity"]
+
+    def session_valid(session_id):
+        if not session_id:
+            return False
+        if not app["session_ttl"]:
+            return True
+        return sessions.get(session_id, 0) > time.monotonic()
+
+    async def handle_login(request):
+        await asyncio.sleep(app["latency"])
+        app["logins"] += 1
+        session_id = f"mock_session_{uuid.uuid4().hex}"
+        body = {"sessionId": session_id}
+        if app["session_ttl"]:
+            sessions[session_id] = time.monotonic() + app["session_ttl"]
+            body["expires_in"] = app["session_ttl"]
+        return web.json_response(body)
+
+    async def handle_update(request):
+        if over_capacity():
+            app["throttled"] += 1
+            return web.Response(status=429, text="Mock: rate limit exceeded.", headers={"Retry-After": "1"})
+        await asyncio.sleep(app["latency"])
+        app["updates_received"] += 1
+        app["requests_received"] += 1
+        if not session_valid(request.query.get("sessionId")):
+            return web.Response(status=401, text="Mock: missing or expired sessionId.")
+        if random.random() < app["failure_rate"]:
+            return web.Response(status=500, text="Mock: Internal server error during update.")
+        return web.Response(text=f"Mock: Record {request.query.get('id')} updated successfully.")
+
+    async def handle_bulk_update(request):
+        if over_capacity():
+            app["throttled"] += 1
+            return web.Response(status=429, text="Mock: rate limit exceeded.", headers={"Retry-After": "1"})
+        if not session_valid(request.query.get("sessionId")):
+            return web.Response(status=401, text="Mock: missing or expired sessionId.")
+        try:
+            records = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="Mock: body must be a JSON array.")
+        if not isinstance(records, list):
+            return web.Response(status=400, text="Mock: body must be a JSON array.")
+        await asyncio.sleep(app["latency"] + app["per_record_latency"] * len(records))
+        app["updates_received"] += len(records)
+        app["requests_received"] += 1
+        results = []
+        for record in records:
+            if not isinstance(record, dict) or "id" not in record:
+                results.append({"id": None, "status": 400, "message": "Mock: record needs an id."})
+            elif random.random() < app["failure_rate"]:
+                results.append({"id": record["id"], "status": 500, "message": "Mock: Internal server error during update."})
+            else:
+                results.append({"id": record["id"], "status": 200, "message": f"Mock: Record {record['id']} updated successfully."})
+        return web.json_response(results)
+
+    app.router.add_post(LOGIN_PATH, handle_login)
+    app.router.add_post(UPDATE_PATH, handle_update)
+    app.router.add_post(BULK_UPDATE_PATH, handle_bulk_update)
+    return app
+
+
+async def start_server(app, host="127.0.0.1", port=0):
+    """Starts the app in the running event loop. Returns (runner, base_url)."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the generic record API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of delay per response.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of updates answered with a 500.")
+    parser.add_argument("--capacity", type=float, default=None, help="Updates/sec accepted before answering 429.")
+    parser.add_argument("--session-ttl", type=float, default=None, help="Seconds before an issued session expires.")
+    args = parser.parse_args()
+    web.run_app(create_app(args.latency, args.failure_rate, args.capacity, session_ttl=args.session_ttl),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark for the Title → FinalName lookup in DocumentUploader.
+
+Compares the old per-file scan (lowercasing and filtering the whole mapping DataFrame
+for every document) with the casefolded index built once by build_title_index, at
+several mapping sizes.
+
+    python benchmark.py
+    python benchmark.py --rows 1000 10000 100000 --files 2000
+
+--workers instead measures end-to-end upload throughput of DocumentUploader's browser-context
+pool against mock_server.py (started in-process unless --base-url points at a running one).
+The browser engine needs Playwright and its Chromium build installed; --engine http posts
+the form directly with aiohttp instead.
+
+    python benchmark.py --workers 1 4 8 --files 200 --latency 0.2
+    python benchmark.py --workers 1 8 32 --files 1000 --engine http
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from uploader import DocumentUploader, build_title_index
+
+
+def synthetic_mapping(rows):
+    """A mapping DataFrame shaped like load_mapping_data's cleaned output."""
+    return pd.DataFrame({
+        "Title": [f"Document_{i:07d}" for i in range(rows)],
+        "FinalName": [f"DEV-{i:07d}" for i in range(rows)],
+    })
+
+
+def scan_lookup(df, title):
+    """The previous upload_single lookup: one full-column scan per file."""
+    match = df[df['Title'].str.lower() == title.lower()]
+    return None if match.empty else str(match.iloc[0]['FinalName']).strip()
+
+
+def run_benchmark(row_counts, files, seed=0):
+    rng = random.Random(seed)
+    results = []
+    for rows in row_counts:
+        df = synthetic_mapping(rows)
+        titles = [f"DOCUMENT_{rng.randrange(rows):07d}" for _ in range(files)] # Case differs on purpose
+
+        started = time.perf_counter()
+        scanned = [scan_lookup(df, title) for title in titles]
+        scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = build_title_index(df)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        indexed = [index.get(title.casefold()) for title in titles]
+        lookup_seconds = time.perf_counter() - started
+
+        assert scanned == indexed, "Index and scan disagree"
+        results.append((rows, scan_seconds, build_seconds, lookup_seconds))
+    return results
+
+
+def run_pool_benchmark(worker_levels, files, latency, base_url=None, engine="browser"):
+    """Uploads `files` small documents at each worker count. Returns [(workers, seconds, uploaded, failed)]."""
+    server = None
+    if not base_url:
+        import mock_server
+        server = mock_server.create_server(latency=latency)
+        base_url = mock_server.start_server(server)
+    results = []
+    try:
+        for workers in worker_levels:
+            with tempfile.TemporaryDirectory() as tmp:
+                upload_folder = os.path.join(tmp, "upload")
+                os.makedirs(upload_folder)
+                for i in range(files):
+                    with open(os.path.join(upload_folder, f"Document_{i:07d}.pdf"), "wb") as f:
+                        f.write(b"%PDF-1.4 benchmark document\n")
+                mapping_path = os.path.join(tmp, "mapping.csv")
+                synthetic_mapping(files).to_csv(mapping_path, index=False)
+
+                uploader = DocumentUploader("demo", "password", mapping_path, upload_folder,
+                                            os.path.join(tmp, "uploaded"), os.path.join(tmp, "failed"),
+                                            "EQUIPMENT_ID_API_FIELD", "DOC_TYPE_APPROVAL", logger=lambda message: None,
+                                            use_mapping_cache=False, reuse_login=False, use_ledger=False, workers=workers,
+                                            base_url=base_url, engine=engine)
+                started = time.perf_counter()
+                uploader.run()
+                results.append((workers, time.perf_counter() - started, uploader.counts.uploaded, uploader.counts.failed))
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mapping lookups: per-file scan vs. casefolded index.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="Mapping sizes to test.")
+    parser.add_argument("--files", type=int, default=None,
+                        help="Documents looked up at each size (default 2000), or uploaded per run with --workers (default 200).")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Benchmark the upload pool at these worker counts instead of mapping lookups.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock server delay per page load/submission (--workers).")
+    parser.add_argument("--base-url", default=None, help="Use an already running mock_server.py (--workers).")
+    parser.add_argument("--engine", choices=["browser", "http"], default="browser", help="Upload engine (--workers).")
+    args = parser.parse_args()
+
+    if args.workers:
+        files = args.files or 200
+        results = run_pool_benchmark(args.workers, files, args.latency, args.base_url, args.engine)
+        print(f"\n{'workers':>8} {'files':>6} {'seconds':>8} {'files/sec':>10} {'uploaded':>9} {'failed':>7}")
+        for workers, seconds, uploaded, failed in results:
+            print(f"{workers:>8} {files:>6} {seconds:>8.2f} {files / seconds:>10.2f} {uploaded:>9} {failed:>7}")
+        return
+
+    args.files = args.files or 2000
+    results = run_benchmark(args.rows, args.files)
+    print(f"\n{'rows':>8} {'files':>6} {'scan (s)':>10} {'build (s)':>10} {'lookups (s)':>12} {'speed-up':>9}")
+    for rows, scan_seconds, build_seconds, lookup_seconds in results:
+        indexed = build_seconds + lookup_seconds
+        print(f"{rows:>8} {args.files:>6} {scan_seconds:>10.3f} {build_seconds:>10.3f} {lookup_seconds:>12.5f} "
+              f"{scan_seconds / indexed if indexed else float('inf'):>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,23 @@
 import customtkinter as ctk
 from tkinter import filedialog
-from threading import Thread # For running the upload in a separate thread
+from threading import Thread, Event # For running the upload in a separate thread
 import csv
+import os
+import queue
+import time
+from pathlib import Path
 # Import the generalized DocumentUploader class
 from uploader import DocumentUploader # Renamed import
 
 ctk.set_appearance_mode("dark")  # Options: "dark", "light"
 ctk.set_default_color_theme("blue")  # Options: "blue", "dark-blue", "green"
 
+# Log rendering: messages are queued from any thread and drawn by the Tk main loop in batches
+LOG_DRAIN_MS = 100 # How often the queue is drained into the log box
+LOG_BATCH_MAX = 2000 # Most messages drawn per drain, so a flood cannot freeze the UI
+LOG_MAX_LINES = 2000 # Lines kept in the log box; older ones are spilled to LOG_SPILL_PATH
+LOG_SPILL_PATH = Path.home() / ".document_uploader" / "gui_activity_log.txt"
+
 class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
     """
     A CustomTkinter GUI application for demonstrating automated document uploading.
@@ -21,6 +31,10 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
         self.geometry("720x800")
         self.resizable(False, False)
         self.abort_flag = False # Flag to signal abortion from GUI
+        self._abort_event = Event() # Replaced for each upload; exists so Abort works before any upload
+        self.log_queue = queue.SimpleQueue() # Messages waiting to be drawn (filled from any thread)
+        self._log_lines = 0 # Lines currently in the log box
+        self._spill_noted = False
 
         self.paths = {} # Dictionary to store paths selected by the user
 
@@ -61,6 +75,7 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
         self.selected_doc_type = ctk.StringVar(value=list(self.doc_types.keys())[0])
 
         self.build_gui()
+        self._log_after_id = self.after(LOG_DRAIN_MS, self.drain_log_queue)
 
     def build_gui(self):
         """Constructs the GUI layout with various frames and widgets."""
@@ -103,6 +118,11 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
 
         self.add_dropdown(dropdown_frame, "Field to Map:", self.selected_field, list(self.field_mapping.keys()), 1, "This maps to a field in the target system (e.g., Equipment ID).")
         self.add_dropdown(dropdown_frame, "Document Type:", self.selected_doc_type, list(self.doc_types.keys()), 2, "This maps to a document type code in the target system.")
+        self.workers_var = ctk.StringVar(value="1") # Browser contexts uploading in parallel
+        self.add_labeled_entry(dropdown_frame, "Parallel Workers:", self.workers_var, row=3)
+        self.watch_var = ctk.BooleanVar(value=False) # Keep running and upload files as they arrive
+        ctk.CTkCheckBox(dropdown_frame, text="Keep watching the upload folder for new files", variable=self.watch_var)\
+            .grid(row=4, column=1, padx=5, pady=8, sticky="w")
 
         # --- Buttons Frame ---
         button_frame = ctk.CTkFrame(self, corner_radius=8)
@@ -187,18 +207,62 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
                 self.log(f"❌ Error exporting CSV template: {e}")
 
     def log(self, message):
-        """Adds a message to the GUI's log box."""
-        self.log_box.configure(state="normal")
-        self.log_box.insert(ctk.END, message + "\n")
-        self.log_box.see(ctk.END) # Scroll to end
-        self.log_box.configure(state="disabled")
+        """Queues a message for the GUI's log box. Safe to call from the upload threads."""
+        self.log_queue.put(message)
+
+    def drain_log_queue(self):
+        """
+        Runs on the Tk main loop every LOG_DRAIN_MS: draws the queued messages as one insert,
+        then trims the box to LOG_MAX_LINES, spilling the trimmed lines to LOG_SPILL_PATH.
+        """
+        messages = []
+        try:
+            while len(messages) < LOG_BATCH_MAX:
+                messages.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if messages:
+            text = "\n".join(messages) + "\n"
+            self.log_box.configure(state="normal")
+            self.log_box.insert(ctk.END, text)
+            self._log_lines += text.count("\n")
+            excess = self._log_lines - LOG_MAX_LINES
+            if excess > 0:
+                self.spill_log_lines(self.log_box.get("1.0", f"{excess + 1}.0"))
+                self.log_box.delete("1.0", f"{excess + 1}.0")
+                self._log_lines -= excess
+            self.log_box.see(ctk.END) # Scroll to end
+            self.log_box.configure(state="disabled")
+
+        # Sooner when a backlog is left over
+        self._log_after_id = self.after(1 if messages and len(messages) == LOG_BATCH_MAX else LOG_DRAIN_MS,
+                                        self.drain_log_queue)
+
+    def spill_log_lines(self, text):
+        """Appends lines trimmed from the log box to LOG_SPILL_PATH."""
+        try:
+            os.makedirs(LOG_SPILL_PATH.parent, exist_ok=True)
+            with open(LOG_SPILL_PATH, "a", encoding="utf-8") as f:
+                if not self._spill_noted:
+                    f.write(f"\n--- GUI session {time.strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+                f.write(text)
+        except OSError:
+            return # Losing old display lines is preferable to stalling the UI
+        if not self._spill_noted:
+            self._spill_noted = True
+            self.log(f"ℹ️ Showing the latest {LOG_MAX_LINES} lines; older lines are saved to {LOG_SPILL_PATH}")
+
+    def destroy(self):
+        self.after_cancel(self._log_after_id) # Stop the drain timer before the widgets go away
+        super().destroy()
 
     def start_upload_thread(self):
         """Starts the upload process in a separate thread to keep GUI responsive."""
         # Ensure the abort flag is reset for a new upload attempt
         self.abort_flag = False
         # Use a threading.Event object for a more robust abort signal between threads
-        self._abort_event = Threading.Event() # Create an Event object
+        self._abort_event = Event() # Create an Event object
         thread = Thread(target=self.run_upload, args=(self._abort_event,), daemon=True) # Pass event to thread
         thread.start()
         self.log("Initiating upload process in background...")
@@ -234,6 +298,14 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
                 self.log("❌ Error: All fields (credentials, paths, and settings) must be selected/filled.")
                 return
 
+            try:
+                workers = int(self.workers_var.get())
+                if workers < 1:
+                    raise ValueError
+            except ValueError:
+                self.log("❌ Error: Parallel Workers must be a whole number of at least 1.")
+                return
+
             uploader = DocumentUploader( # Use generalized class
                 username=username,
                 password=password,
@@ -244,9 +316,10 @@ class DocumentUploaderGUI(ctk.CTk): # Generalized class name from CRMUploaderGUI
                 field_to_fill_api_name=selected_field_api_name, # Renamed parameter
                 document_type_api_code=document_type_api_code, # Renamed parameter
                 logger=self.log, # Pass the GUI's log method
-                abort_flag=abort_event # Pass the Event object
+                abort_flag=abort_event, # Pass the Event object
+                workers=workers
             )
-            uploader.run() # Execute the uploader logic
+            uploader.run(watch=self.watch_var.get()) # Execute the uploader logic (until Abort in watch mode)
 
         except Exception as e:
             self.log(f"❌ An error occurred during the upload process: {e}")
@@ -0,0 +1,229 @@
+"""
+Local stand-in for the document upload web app driven by uploader.py.
+
+Serves a login page and an upload form shaped like the real system's: a file input, the
+rbf_setPicklistCode / rbf_setFieldValue JavaScript helpers that fill the document type and
+target field, and a "Submit Document" button. Saved uploads get a `.upload-success` banner.
+It only uses the standard library, so DocumentUploader(base_url=...) and benchmark.py can run
+real browser round-trips without any private infrastructure. With `session_ttl` set, login
+cookies expire after that many seconds and the upload page redirects back to the login form.
+
+    python mock_server.py --port 8090 --latency 0.2
+    python benchmark.py --workers 1 4 8 --base-url http://127.0.0.1:8090
+"""
+import argparse
+import email.parser
+import email.policy
+import html
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http import cookies
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Paths mirror LOGIN_PATH / UPLOAD_PATH in uploader.py
+LOGIN_PATH = "/login"
+UPLOAD_PATH = "/upload-documents"
+STATS_PATH = "/stats"
+SESSION_COOKIE = "mock_session"
+DEMO_USERNAME = "demo"
+DEMO_PASSWORD = "password"
+
+LOGIN_PAGE = """<!doctype html>
+<html><head><title>Mock Login</title></head><body>
+<form method="post" action="{login_path}">
+  <input name="username"> <input name="password" type="password">
+  <button type="submit">Log in</button>
+</form>
+{error}
+</body></html>"""
+
+UPLOAD_PAGE = """<!doctype html>
+<html><head><title>Mock Document Upload</title>
+<script>
+function setHidden(field, value) {{
+  const form = document.getElementById("upload-form");
+  let input = form.querySelector('input[type="hidden"][name="' + field + '"]');
+  if (!input) {{
+    input = document.createElement("input");
+    input.type = "hidden";
+    input.name = field;
+    form.appendChild(input);
+  }}
+  input.value = value;
+}}
+function rbf_setPicklistCode(field, code) {{ setHidden(field, code); }}
+function rbf_setFieldValue(field, value) {{ setHidden(field, value); }}
+</script></head><body>
+{status}
+<form id="upload-form" method="post" action="{upload_path}" enctype="multipart/form-data">
+  <input type="file" name="file">
+  <button type="submit">Submit Document</button>
+</form>
+</body></html>"""
+
+
+def create_server(host="127.0.0.1", port=0, latency=0.2, failure_rate=0.0, session_ttl=None):
+    """
+    Builds the mock web app (not yet serving). `latency` is added to every page load and
+    submission; `failure_rate` is the fraction of uploads answered with an error page.
+    Counters and saved documents are kept on the server object.
+    """
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass # Keep request logging out of benchmarks
+
+        def send_page(self, body, status=200, headers=None):
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def redirect(self, location, headers=None):
+            self.send_response(303)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+        def logged_in(self):
+            jar = cookies.SimpleCookie(self.headers.get("Cookie", ""))
+            session = jar.get(SESSION_COOKIE)
+            with lock:
+                return session is not None and server.sessions.get(session.value, 0) > time.monotonic()
+
+        def read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path == LOGIN_PATH:
+                time.sleep(server.latency)
+                self.send_page(LOGIN_PAGE.format(login_path=LOGIN_PATH, error=""))
+            elif path == UPLOAD_PATH:
+                if not self.logged_in():
+                    self.redirect(LOGIN_PATH)
+                    return
+                time.sleep(server.latency)
+                self.send_page(UPLOAD_PAGE.format(upload_path=UPLOAD_PATH, status=""))
+            elif path == STATS_PATH:
+                with lock:
+                    body = json.dumps({"logins": server.logins, "uploads": len(server.documents),
+                                       "rejected": server.rejected})
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+            else:
+                self.send_page("Not found", status=404)
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            if path == LOGIN_PATH:
+                self.handle_login()
+            elif path == UPLOAD_PATH:
+                self.handle_upload()
+            else:
+                self.send_page("Not found", status=404)
+
+        def handle_login(self):
+            form = parse_qs(self.read_body().decode("utf-8"))
+            time.sleep(server.latency)
+            if form.get("username") != [DEMO_USERNAME] or form.get("password") != [DEMO_PASSWORD]:
+                self.send_page(LOGIN_PAGE.format(login_path=LOGIN_PATH, error="<p>Invalid credentials.</p>"),
+                               status=401)
+                return
+            session_id = uuid.uuid4().hex
+            cookie = f"{SESSION_COOKIE}={session_id}; Path=/; HttpOnly"
+            if server.session_ttl:
+                cookie += f"; Max-Age={math.ceil(server.session_ttl)}" # Whole seconds; the server-side expiry is exact
+            with lock:
+                server.sessions[session_id] = time.monotonic() + (server.session_ttl or float("inf"))
+                server.logins += 1
+            self.redirect(UPLOAD_PATH, {"Set-Cookie": cookie})
+
+        def handle_upload(self):
+            body = self.read_body() # Read before any redirect, or the client's upload is cut off mid-write
+            if not self.logged_in():
+                self.redirect(LOGIN_PATH)
+                return
+            content_type = self.headers.get("Content-Type", "")
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+            fields, filename, size = {}, None, 0
+            if message.is_multipart():
+                for part in message.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    if part.get_filename():
+                        filename, size = part.get_filename(), len(part.get_payload(decode=True) or b"")
+                    elif name:
+                        fields[name] = part.get_content().strip()
+            time.sleep(server.latency)
+
+            with lock:
+                failed = server.random.random() < server.failure_rate
+            if not filename or len(fields) < 2 or failed:
+                reason = "Simulated server error." if failed else "A file, document type and field value are required."
+                with lock:
+                    server.rejected += 1
+                self.send_page(UPLOAD_PAGE.format(upload_path=UPLOAD_PATH,
+                                                  status=f'<div class="upload-error">{html.escape(reason)}</div>'),
+                               status=400)
+                return
+            with lock:
+                server.documents.append({"filename": filename, "size": size, "fields": fields})
+            self.send_page(UPLOAD_PAGE.format(upload_path=UPLOAD_PATH,
+                                              status=f'<div class="upload-success">Document saved: {html.escape(filename)}</div>'))
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.random = random.Random(0)
+    server.session_ttl = session_ttl
+    server.sessions = {} # Session id -> expiry (monotonic time)
+    server.logins = 0
+    server.rejected = 0
+    server.documents = [] # {"filename", "size", "fields"} for each saved upload
+    return server
+
+
+def start_server(server):
+    """Serves `server` from a daemon thread. Returns its base URL."""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the document upload web app.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of delay per page load and submission.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of uploads answered with an error.")
+    parser.add_argument("--session-ttl", type=float, default=None, help="Seconds before a login cookie expires.")
+    args = parser.parse_args()
+    server = create_server(args.host, args.port, args.latency, args.failure_rate, args.session_ttl)
+    print(f"Mock upload app on http://{args.host}:{args.port}{LOGIN_PATH} (login: {DEMO_USERNAME} / {DEMO_PASSWORD})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 import os
 import time
 import csv
+import asyncio
+import errno
+import mimetypes
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from pathlib import Path
 import shutil
+from collections import deque
 # Playwright is included for demonstrating browser automation capability.
 # In a sanitized version, actual browser interactions with sensitive internal systems are simulated.
 from playwright.sync_api import sync_playwright
@@ -21,20 +31,536 @@ PASSWORD_INPUT_SELECTOR = 'input[name="password"]' # Generalized
 LOGIN_BUTTON_SELECTOR = 'button[type="submit"]'
 UPLOAD_FILE_INPUT_SELECTOR = 'input[type="file"]' # More generic selector for file input
 SUBMIT_FORM_BUTTON_SELECTOR = 'button:has-text("Submit Document")' # Generalized from 'Save & New'
+UPLOAD_SUCCESS_SELECTOR = '.upload-success' # Shown by the upload page once a document is saved
+DOCUMENT_TYPE_FIELD = "SRS_Document_Type" # Picklist set through rbf_setPicklistCode
+
+# Paths used in live mode (base_url set), e.g. against the local stand-in in mock_server.py
+LOGIN_PATH = "/login"
+UPLOAD_PATH = "/upload-documents"
+UPLOAD_FILE_FIELD = "file" # Multipart field name of the upload form's file input
+
+# Upload engines: drive the upload page in Chromium, or post the form directly over HTTP
+ENGINE_BROWSER = "browser"
+ENGINE_HTTP = "http"
+ENGINES = (ENGINE_BROWSER, ENGINE_HTTP)
 
 # Patterns to block resources for faster simulated page loads
 RESOURCE_BLOCK_PATTERNS = [
     "**/*.css", "**/*.png", "**/*.jpg", "**/*.jpeg", "**/*.gif",
     "**/*.svg", "**/*.woff", "**/*.woff2", "**/*.ttf", "**/*.eot", "**/*.ico",
 ]
+
+# Cache of parsed mapping files, so repeated runs against the same workbook skip pd.read_excel
+MAPPING_CACHE_DIR = Path.home() / ".document_uploader" / "mapping_cache"
+MAPPING_CACHE_MAX_BYTES = 256 * 1024 * 1024 # Least recently used entries are evicted above this
+MAPPING_CACHE_VERSION = 1 # Bump when the cleaning in load_mapping_data changes
+
+# Browser storage state (cookies/local storage) saved after a successful login and reused by later runs
+STORAGE_STATE_DIR = Path.home() / ".document_uploader" / "storage_state"
+STORAGE_STATE_MAX_AGE = 8 * 60 * 60 # Seconds before a saved login is no longer trusted without a fresh login
+
+# Ledger of uploaded document contents, so the same document is never uploaded twice
+UPLOAD_LEDGER_PATH = Path.home() / ".document_uploader" / "upload_ledger.sqlite3"
+HASH_WORKERS = 4 # Threads hashing upcoming files while earlier ones upload
+
+# Run log: streamed to disk as JSONL, with only the most recent lines kept in memory
+LOG_RING_SIZE = 1000 # Lines kept in log_entries for display
+LOG_FLUSH_LINES = 200 # Buffered records are written once this many are waiting...
+LOG_FLUSH_SECONDS = 1.0 # ...or once the oldest has waited this long
+
+# Document types picked up from the upload folder
+SUPPORTED_EXTENSIONS = (
+    ".pdf", ".docx", ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".webp", ".jfif", ".svg", ".txt", ".csv", ".xls", ".xlsx"
+)
+
+# Watch mode (run(watch=True)): how new files in the upload folder are noticed
+WATCH_SETTLE_SECONDS = 2.0 # A file is taken once its size and mtime have not changed for this long
+WATCH_POLL_INTERVAL = 1.0 # Seconds between checks (directory rescans when inotify is unavailable)
+WATCH_RESCAN_INTERVAL = 30.0 # Full rescan even with inotify, in case its event queue overflowed
 # --- End Configuration ---
 
+
+def build_title_index(df, log=print):
+    """
+    Builds a case-insensitive Title → FinalName lookup from the mapping DataFrame, so each
+    file is matched with one dict lookup instead of a scan of the whole mapping.
+    Titles are casefolded. When a Title appears more than once the first row wins (as the
+    old scan did), and repeats are reported: identical FinalNames as duplicates, differing
+    ones as conflicts.
+    """
+    keys = df['Title'].str.casefold()
+    final_names = df['FinalName']
+    repeated = keys.duplicated(keep=False)
+    if repeated.any():
+        groups = df[repeated].assign(_key=keys[repeated]).groupby('_key', sort=False)
+        for key, group in groups:
+            names = list(dict.fromkeys(group['FinalName']))
+            titles = ", ".join(f"'{t}'" for t in dict.fromkeys(group['Title']))
+            if len(names) > 1:
+                log(f"⚠️ Conflicting mapping for Title {titles}: {names}. Using '{names[0]}' (first row).")
+            else:
+                log(f"⚠️ Duplicate mapping rows for Title {titles} ({len(group)} rows, same FinalName).")
+    first = ~keys.duplicated()
+    return dict(zip(keys[first], final_names[first]))
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MappingCache:
+    """
+    On-disk cache of cleaned mapping DataFrames, stored as pickles named after the source
+    file's SHA-256. A small index remembers the size and mtime each path had when it was
+    hashed, so an unchanged file is recognised from its stat alone; a changed stat means
+    the file is hashed again (a touched but identical file still hits). The cache is kept
+    under `max_bytes` by evicting the least recently used entries.
+    """
+    def __init__(self, cache_dir=MAPPING_CACHE_DIR, max_bytes=MAPPING_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.index_path = self.cache_dir / "index.json"
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def content_key(self, source_path):
+        """Cache key for the file: its SHA-256 (re-hashed only when path, size or mtime changed)."""
+        source_path = os.path.abspath(source_path)
+        stat = os.stat(source_path)
+        index = self._load_index()
+        entry = index.get(source_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        sha256 = file_sha256(source_path)
+        index[source_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._save_index(index)
+        return sha256
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}_v{MAPPING_CACHE_VERSION}.pkl"
+
+    def get(self, source_path):
+        """Returns (cached DataFrame or None, key). Pass the key to put() after a miss."""
+        key = self.content_key(source_path)
+        entry_path = self._entry_path(key)
+        if not entry_path.exists():
+            return None, key
+        try:
+            df = pd.read_pickle(entry_path)
+        except Exception:
+            entry_path.unlink(missing_ok=True) # Corrupt or from an incompatible pandas; rebuild it
+            return None, key
+        os.utime(entry_path) # Mark as recently used for LRU eviction
+        return df, key
+
+    def put(self, key, df):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path.with_suffix(".tmp")
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, entry_path)
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes (the newest always stays)."""
+        entries = sorted(self.cache_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+        total = 0
+        for i, entry_path in enumerate(entries):
+            total += entry_path.stat().st_size
+            if i > 0 and total > self.max_bytes:
+                entry_path.unlink(missing_ok=True)
+
+
+class FolderWatcher:
+    """
+    Reports files that land in a folder once they have stopped growing. Uses inotify (via the
+    optional inotify_simple package, Linux only) to notice new files as soon as they appear,
+    and falls back to polling with os.scandir. Rescans only list names (no stat) for files
+    already handed out, so they stay cheap with tens of thousands of files in the folder;
+    stat calls are limited to files still waiting to settle.
+    """
+    def __init__(self, folder, extensions=SUPPORTED_EXTENSIONS, settle_seconds=WATCH_SETTLE_SECONDS,
+                 poll_interval=WATCH_POLL_INTERVAL, rescan_interval=WATCH_RESCAN_INTERVAL):
+        self.folder = folder
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.pending = {} # Name -> ((size, mtime_ns), unchanged since) or None before its first stat
+        self.reported = set() # Names already handed out that are still in the folder
+        self._last_rescan = 0.0
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags
+            self._flags = flags
+            self.inotify = INotify()
+            self.inotify.add_watch(folder, flags.CREATE | flags.MOVED_TO | flags.CLOSE_WRITE)
+        except (ImportError, OSError):
+            self.inotify = None # Not Linux, package missing, or out of watches: poll instead
+        self.rescan()
+
+    @property
+    def mode(self):
+        return "inotify" if self.inotify else "polling"
+
+    def wanted(self, name):
+        # Skips Office lock files (~$...) and hidden partial downloads
+        return name.lower().endswith(self.extensions) and not name.startswith(("~$", "."))
+
+    def rescan(self):
+        """Full pass over the folder: new names become pending, names that left the folder are forgotten."""
+        present = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                name = entry.name
+                if not self.wanted(name):
+                    continue
+                present.add(name)
+                if name in self.reported or name in self.pending:
+                    continue
+                try:
+                    if entry.is_file(): # Answered from the directory listing on most platforms, no stat
+                        self.pending[name] = None
+                except OSError:
+                    pass
+        self.reported &= present
+        for name in self.pending.keys() - present:
+            del self.pending[name]
+        self._last_rescan = time.monotonic()
+
+    def settled(self):
+        """Stats the pending files; returns (and stops tracking) those unchanged for settle_seconds."""
+        now = time.monotonic()
+        ready = []
+        for name, previous in list(self.pending.items()):
+            try:
+                stat = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                del self.pending[name]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if previous is None or previous[0] != signature:
+                self.pending[name] = (signature, now) # New or still growing
+            elif now - previous[1] >= self.settle_seconds:
+                del self.pending[name]
+                self.reported.add(name)
+                ready.append(name)
+        return sorted(ready)
+
+    def poll(self):
+        """Waits up to poll_interval for new files, then returns the ones that have settled."""
+        if self.inotify:
+            for event in self.inotify.read(timeout=int(self.poll_interval * 1000)):
+                if not event.name or not self.wanted(event.name):
+                    continue
+                if event.mask & (self._flags.CREATE | self._flags.MOVED_TO):
+                    self.reported.discard(event.name) # A new file under a name handled before
+                if event.name not in self.reported:
+                    self.pending.setdefault(event.name, None)
+            if time.monotonic() - self._last_rescan >= self.rescan_interval:
+                self.rescan()
+        else:
+            time.sleep(self.poll_interval)
+            self.rescan()
+        return self.settled()
+
+    def close(self):
+        if self.inotify:
+            self.inotify.close()
+
+
+class StreamingLog:
+    """
+    Append-only JSONL log of a run: one record per line with ts, message and, where known, the
+    file, stage, outcome and duration. Records are buffered and written in batches (every
+    LOG_FLUSH_LINES records or LOG_FLUSH_SECONDS, whichever comes first; a timer covers idle
+    spells such as a quiet watch folder), so a crash loses at most the last moments.
+    Memory stays flat: only the last `ring_size` display lines are kept in `recent`.
+    """
+    FIELDS = ("ts", "file", "stage", "outcome", "duration", "message")
+
+    def __init__(self, path, ring_size=LOG_RING_SIZE, flush_lines=LOG_FLUSH_LINES, flush_seconds=LOG_FLUSH_SECONDS):
+        self.path = path
+        self.recent = deque(maxlen=ring_size)
+        self.flush_lines = flush_lines
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._oldest = None # monotonic time of the oldest buffered record
+        self._timer = None # Flushes the buffer if no further record arrives in time
+        self._file = None
+        self._started = False # The first open truncates; reopening after close() appends
+
+    def write(self, record, line=None):
+        """Buffers one record; `line` (the display form) also goes into the ring buffer."""
+        with self._lock:
+            if line is not None:
+                self.recent.append(line)
+            self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            if len(self._buffer) >= self.flush_lines or now - self._oldest >= self.flush_seconds:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_locked(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a" if self._started else "w", encoding="utf-8")
+            self._started = True
+        self._file.writelines(self._buffer)
+        self._file.flush()
+        self._buffer.clear()
+        self._oldest = None
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def records(self):
+        """Streams the records written so far back from disk (after flushing the buffer)."""
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    yield json.loads(raw)
+                except ValueError:
+                    continue # A line cut short by a crash
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+class DestinationIndex:
+    """
+    Names already taken in each destination folder, listed once per run with os.scandir, so a
+    free name for a processed file is found in memory instead of probing os.path.exists in a
+    loop. Files added to a folder later are caught by move_file, which never overwrites.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._taken = {} # Folder -> normcased names in it
+        self._next_counter = {} # (folder, proposed name) -> first collision counter worth trying
+
+    def _names(self, folder):
+        names = self._taken.get(folder)
+        if names is None:
+            os.makedirs(folder, exist_ok=True) # Ensure destination folder exists
+            with os.scandir(folder) as entries:
+                names = {os.path.normcase(entry.name) for entry in entries} # Case-insensitive on Windows
+            self._taken[folder] = names
+        return names
+
+    def reserve(self, folder, dest_name, status):
+        """
+        Claims a free path in `folder` for dest_name. Collisions get the same names as always:
+        '<stem>_<N>_<status><ext>' with the lowest free N.
+        """
+        with self._lock:
+            names = self._names(folder)
+            candidate = dest_name
+            if os.path.normcase(candidate) in names:
+                stem, ext = Path(dest_name).stem, Path(dest_name).suffix
+                counter = self._next_counter.get((folder, dest_name), 1)
+                candidate = f"{stem}_{counter}_{status}{ext}"
+                while os.path.normcase(candidate) in names:
+                    counter += 1
+                    candidate = f"{stem}_{counter}_{status}{ext}"
+                self._next_counter[(folder, dest_name)] = counter + 1
+            names.add(os.path.normcase(candidate))
+            return os.path.join(folder, candidate)
+
+    def release(self, path):
+        """Frees a reserved name whose move failed."""
+        with self._lock:
+            folder, name = os.path.split(path)
+            self._taken.get(folder, set()).discard(os.path.normcase(name))
+
+
+def move_file(source, dest_path):
+    """
+    Moves `source` to `dest_path` without ever replacing an existing file there: raises
+    FileExistsError instead. On one filesystem this is a hard link plus unlink on POSIX (plain
+    os.rename would silently overwrite) and os.rename on Windows (which refuses to overwrite).
+    Across filesystems, or where hard links are unsupported, it copies into a newly created file.
+    """
+    if os.name == "nt":
+        try:
+            os.rename(source, dest_path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV and getattr(e, "winerror", None) != 17: # 17: not the same device
+                raise
+    else:
+        try:
+            os.link(source, dest_path)
+            os.unlink(source)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+                raise
+    with open(source, "rb") as src, open(dest_path, "xb") as dst: # "x": fail if the name was taken meanwhile
+        try:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        except BaseException:
+            dst.close()
+            os.unlink(dest_path)
+            raise
+    shutil.copystat(source, dest_path)
+    os.unlink(source)
+
+
+class PostProcessor:
+    """
+    Background pipeline stage that moves finished files to the uploaded/failed folders, one at
+    a time in the order they finished, so upload workers go straight on to their next file.
+    """
+    def __init__(self, move):
+        self._move = move
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="post-processor", daemon=True)
+        self._thread.start()
+
+    def submit(self, *job):
+        self._jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            self._move(*job)
+
+    def close(self):
+        """Waits until every queued file has been moved."""
+        self._jobs.put(None)
+        self._thread.join()
+
+
+class UploadLedger:
+    """
+    SQLite record of every uploaded document, keyed by the SHA-256 of its contents, with the
+    FinalName and document type it went to. Checked before each upload so a file dropped back
+    into the upload folder, or copied under another name, is skipped instead of uploaded again.
+    One connection is shared by the upload workers behind a lock.
+    """
+    def __init__(self, path=UPLOAD_LEDGER_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._in_flight = {} # Hash -> (filename, Event set on release) for uploads running right now
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    sha256 TEXT PRIMARY KEY,
+                    final_name TEXT NOT NULL,
+                    document_type TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    uploaded_at REAL NOT NULL
+                )""")
+
+    def claim(self, sha256, filename):
+        """
+        Returns None and marks the hash as uploading when it is new. Returns the earlier upload
+        ({filename, final_name, document_type, uploaded_at}) when the ledger has one. While a copy
+        is still uploading in this run, returns {filename, pending} instead: wait for the `pending`
+        Event and claim again, since the copy only counts as uploaded if that upload succeeds.
+        """
+        with self._lock:
+            if sha256 in self._in_flight:
+                owner, pending = self._in_flight[sha256]
+                return {"filename": owner, "pending": pending}
+            row = self._conn.execute(
+                "SELECT filename, final_name, document_type, uploaded_at FROM uploads WHERE sha256 = ?", (sha256,)).fetchone()
+            if row:
+                return dict(zip(("filename", "final_name", "document_type", "uploaded_at"), row))
+            self._in_flight[sha256] = (filename, threading.Event())
+            return None
+
+    def release(self, sha256, uploaded, final_name=None, document_type=None):
+        """Ends a claim; a successful upload is recorded for good. Copies waiting on it are woken."""
+        with self._lock:
+            filename, pending = self._in_flight.pop(sha256, (None, None))
+            if uploaded and filename:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                                       (sha256, final_name or "", document_type or "", filename, time.time()))
+        if pending:
+            pending.set()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class UploadCounts:
+    """Success/failure/skipped tally shared by the upload workers."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.failed = 0
+        self.skipped = 0
+        self._abort_logged = False
+
+    def record(self, success):
+        with self._lock:
+            if success:
+                self.uploaded += 1
+            else:
+                self.failed += 1
+
+    def record_skipped(self):
+        with self._lock:
+            self.skipped += 1
+
+    def first_abort(self):
+        """True only for the first worker to notice an abort, so it is logged once."""
+        with self._lock:
+            first, self._abort_logged = not self._abort_logged, True
+            return first
+
+
 class DocumentUploader: # Generalized class name from CRMUploader
     """
     A class to demonstrate automated document uploading to a web system
     using Playwright. Interactions with external systems are simulated for security.
     """
-    def __init__(self, username, password, excel_path, upload_folder, uploaded_folder, failed_folder, field_to_fill_api_name, document_type_api_code, logger=print, abort_flag=None):
+    def __init__(self, username, password, excel_path, upload_folder, uploaded_folder, failed_folder, field_to_fill_api_name, document_type_api_code, logger=print, abort_flag=None, use_mapping_cache=True,
+                 workers=1, base_url=None, reuse_login=True,
+                 engine=ENGINE_BROWSER, use_ledger=True):
         self.username = username
         self.password = password
         self.excel_path = excel_path
@@ -45,37 +571,73 @@ class DocumentUploader: # Generalized class name from CRMUploader
         self.field_to_fill_api_name = field_to_fill_api_name
         self.document_type_api_code = document_type_api_code
         self.abort_flag = abort_flag # Used for external abortion (e.g., from GUI)
+        self.mapping_cache = MappingCache() if use_mapping_cache else None
+        self.workers = max(1, int(workers)) # Browser contexts uploading in parallel
+        # With a base_url the browser really drives the login and upload pages there (e.g. mock_server.py);
+        # without one, web interactions stay simulated.
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.counts = UploadCounts()
+        self.dest_index = DestinationIndex() # Rebuilt at the start of each run
+        self._post_processor = None # PostProcessor while a run is uploading
+        self.reuse_login = reuse_login # Reuse the storage state saved by an earlier run instead of logging in
+        self._storage_state = None # Latest logged-in storage state, shared with new contexts
+        self._login_lock = threading.Lock() # One re-login at a time when a session is rejected mid-run
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown upload engine '{engine}'. Use one of: {', '.join(ENGINES)}.")
+        self.engine = engine
+        self.use_ledger = use_ledger
+        self.ledger = None # UploadLedger, open for the duration of run()
+        self._hash_pool = None
+        self._hashes = {} # File -> Future of its SHA-256
+        self._mapping_mtime = None # Mapping file mtime when last loaded, to reload it in watch mode
 
         # Log file path within the uploaded_folder for consistency
         self.log_file_path = os.path.join(uploaded_folder, "automated_upload_log.txt") # Generic log name
-        self.log_entries = []
+        # Every record is streamed to this JSONL file; exports are produced from it
+        self.log_stream = StreamingLog(os.path.splitext(self.log_file_path)[0] + ".jsonl")
+        self.log_entries = self.log_stream.recent # Bounded: only the most recent lines
         self.logger = logger # Custom logger function (e.g., GUI log, or default print)
 
         # Ensure output folders exist
         os.makedirs(self.uploaded_folder, exist_ok=True)
         os.makedirs(self.failed_folder, exist_ok=True)
 
-    def log(self, message):
-        """Appends a timestamped message to the internal log and calls the logger."""
-        timestamped = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] - {message}"
-        self.log_entries.append(timestamped)
-        self.logger(timestamped)
+    def log(self, message, file=None, stage=None, outcome=None, duration=None, echo=True):
+        """
+        Streams a record to the run log and, unless echo=False, shows the timestamped message
+        through the logger. file/stage/outcome/duration add structure for later analysis.
+        """
+        ts = time.strftime('%Y-%m-%d %H:%M:%S')
+        record = {"ts": ts, "message": message}
+        for key, value in (("file", file), ("stage", stage), ("outcome", outcome)):
+            if value is not None:
+                record[key] = value
+        if duration is not None:
+            record["duration"] = round(duration, 3)
+        timestamped = f"[{ts}] - {message}" if echo else None
+        self.log_stream.write(record, timestamped)
+        if echo:
+            self.logger(timestamped)
+
+    def is_aborted(self):
+        return bool(self.abort_flag and self.abort_flag.is_set())
 
     def export_log(self, as_csv=False):
-        """Exports log entries to a file (text or CSV)."""
+        """Exports the run log to a file (text or CSV), streamed from the JSONL log on disk."""
         try:
             if as_csv:
                 csv_path = os.path.splitext(self.log_file_path)[0] + ".csv"
                 with open(csv_path, 'w', encoding='utf-8', newline='') as f:
                     writer = csv.writer(f)
-                    writer.writerow(["Timestamp_Message"]) # Header for CSV
-                    for entry in self.log_entries:
-                        writer.writerow([entry])
+                    writer.writerow(["Timestamp", "File", "Stage", "Outcome", "Duration_s", "Message"]) # Header for CSV
+                    for record in self.log_stream.records():
+                        writer.writerow([record.get(field, "") for field in StreamingLog.FIELDS])
                 self.log(f"📄 Log exported to {csv_path}")
             else:
                 with open(self.log_file_path, 'w', encoding='utf-8') as f:
-                    for entry in self.log_entries:
-                        f.write(entry + "\n")
+                    for record in self.log_stream.records():
+                        if record.get("message"):
+                            f.write(f"[{record['ts']}] - {record['message']}\n")
                 self.log(f"📄 Log exported to {self.log_file_path}")
         except Exception as e:
             self.log(f"❌ Error exporting log: {e}")
@@ -98,6 +660,9 @@ class DocumentUploader: # Generalized class name from CRMUploader
         In a real application, this would interact with a live login page.
         For this public demo, it's a conceptual representation.
         """
+        if self.base_url:
+            return self.login_live(page)
+
         self.log("🔐 Simulating login process...")
         # Simulate navigating to the login page (no actual network request made here)
         self.log(f"  Attempting to access: {GENERIC_LOGIN_URL}")
@@ -126,55 +691,208 @@ class DocumentUploader: # Generalized class name from CRMUploader
         #     self.log(f"❌ Login error (simulated): {e}")
         #     return False
 
-    def rename_and_move(self, file, success):
-        """Moves processed files to either the 'uploaded' or 'failed' folder."""
+    def login_live(self, page):
+        """Logs in through the login page at base_url (the commented-out flow above, pointed at a test server)."""
+        login_url = self.base_url + LOGIN_PATH
+        self.log(f"🔐 Logging in at: {login_url}")
+        try:
+            page.goto(login_url, timeout=30000)
+            page.wait_for_selector(USERNAME_INPUT_SELECTOR, timeout=15000)
+            page.fill(USERNAME_INPUT_SELECTOR, self.username)
+            page.fill(PASSWORD_INPUT_SELECTOR, self.password)
+            page.click(LOGIN_BUTTON_SELECTOR)
+            page.wait_for_load_state("networkidle", timeout=30000)
+            if page.locator(USERNAME_INPUT_SELECTOR).count() > 0: # Check if still on login page
+                self.log("❌ Login failed. Check credentials.")
+                return False
+            self.log("✅ Login successful.")
+            return True
+        except Exception as e:
+            self.log(f"❌ Login error: {e}")
+            return False
+
+    def login_url(self):
+        return self.base_url + LOGIN_PATH if self.base_url else GENERIC_LOGIN_URL
+
+    def storage_state_path(self):
+        """Saved-login file for this login URL and user."""
+        key = hashlib.sha256(f"{self.login_url()}|{self.username}".encode("utf-8")).hexdigest()[:16]
+        return STORAGE_STATE_DIR / f"{key}.json"
+
+    def load_storage_state(self):
+        """
+        Storage state saved by an earlier run, or None when there is none, it is older than
+        STORAGE_STATE_MAX_AGE, or one of its cookies has expired. This only checks the file;
+        session_accepted() checks it against the server.
+        """
+        if not self.reuse_login:
+            return None
+        try:
+            with open(self.storage_state_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            state = saved["state"]
+            now = time.time()
+            if now - saved["saved_at"] > STORAGE_STATE_MAX_AGE:
+                return None
+            if any(0 < cookie.get("expires", -1) < now for cookie in state.get("cookies", [])):
+                return None # -1 marks a session cookie, which has no expiry of its own
+            return state
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save_storage_state(self, state):
+        """Saves a logged-in storage state (owner-only file, replaced atomically) and shares it with new contexts."""
+        self._storage_state = state
+        if not self.reuse_login:
+            return
+        try:
+            path = self.storage_state_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600) # Holds session cookies
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": time.time(), "state": self._storage_state}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.log(f"⚠️ Warning: Could not save the login for reuse: {e}")
+
+    def discard_storage_state(self):
+        try:
+            os.remove(self.storage_state_path())
+        except OSError:
+            pass
+
+    def session_accepted(self, page):
+        """True if the page's cookies still open the upload page (no redirect to the login form)."""
+        if not self.base_url:
+            return True # Simulated sessions never expire
+        try:
+            page.goto(self.base_url + UPLOAD_PATH, timeout=30000)
+            return page.locator(USERNAME_INPUT_SELECTOR).count() == 0
+        except Exception:
+            return False
+
+    def start_session(self, browser):
+        """
+        Opens the main page and logs it in. A saved storage state (cookies and local storage) is
+        reused when the server still accepts it; otherwise a fresh context does a full login and
+        the new state is saved. Returns the logged-in page, or None if the login failed.
+        """
+        saved_state = self.load_storage_state()
+        if saved_state:
+            page = self.new_context(browser, storage_state=saved_state).new_page()
+            self.disable_resources(page)
+            if self.session_accepted(page):
+                self._storage_state = saved_state
+                self.log("🔓 Reusing saved login (skipped the login page).")
+                return page
+            self.log("🔐 Saved login was rejected; logging in again.")
+            page.context.close() # Start clean: none of the rejected cookies or local storage
+            self.discard_storage_state()
+
+        page = self.new_context(browser).new_page()
+        self.disable_resources(page) # Still useful for conceptual speed up
+        if not self.login(page):
+            return None
+        self.save_storage_state(page.context.storage_state())
+        return page
+
+    def relogin(self, page):
+        """
+        Called when a page is bounced to the login form mid-run. Under a lock, so when several
+        workers notice at once the first one logs in and the others pick up its cookies.
+        """
+        with self._login_lock:
+            if self._storage_state:
+                page.context.add_cookies(self._storage_state.get("cookies", []))
+                if self.session_accepted(page):
+                    return True
+            self.log("🔐 Session was rejected mid-run; logging in again.")
+            if not self.login(page):
+                return False
+            self.save_storage_state(page.context.storage_state())
+            return True
+
+    def rename_and_move(self, file, success, status=None):
+        """
+        Moves processed files to either the 'uploaded' or 'failed' folder.
+        `status` overrides the name suffix (e.g. 'skipped' for a known duplicate).
+        """
         try:
             source = os.path.join(self.upload_folder, file)
-            if not os.path.exists(source):
-                self.log(f"⚠️ Warning: Source file not found: {source}. Skipping move.")
-                return
 
             ext = Path(file).suffix
             # Use a generic name for the destination file
-            dest_name_status = 'uploaded' if success else 'failed'
+            dest_name_status = status or ('uploaded' if success else 'failed')
             dest_name = f"{Path(file).stem}_{dest_name_status}{ext}"
             dest_folder = self.uploaded_folder if success else self.failed_folder
 
-            os.makedirs(dest_folder, exist_ok=True) # Ensure destination folder exists
+            # Free name from the in-memory index (duplicates get a counter before the status suffix)
+            started = time.monotonic()
+            while True:
+                dest_path = self.dest_index.reserve(dest_folder, dest_name, dest_name_status)
+                try:
+                    move_file(source, dest_path)
+                    break
+                except FileExistsError:
+                    continue # Appeared after the folder was listed; it stays reserved, so try the next name
+                except FileNotFoundError:
+                    self.dest_index.release(dest_path)
+                    self.log(f"⚠️ Warning: Source file not found: {source}. Skipping move.")
+                    return
+                except Exception:
+                    self.dest_index.release(dest_path)
+                    raise
+            self.log(f"📁 Moved '{os.path.basename(file)}' to: '{os.path.basename(dest_path)}'",
+                     file=file, stage="move", outcome=dest_name_status, duration=time.monotonic() - started)
 
-            dest_path = os.path.join(dest_folder, dest_name)
+        except Exception as e:
+            self.log(f"❌ Error moving file '{file}': {e}")
 
-            # Handle duplicate filenames in destination folder
-            counter = 1
-            original_dest_path = dest_path # Store original proposed path
-            while os.path.exists(dest_path):
-                name_part = Path(original_dest_path).stem
-                ext_part = Path(original_dest_path).suffix
-                # Append counter before the final status suffix to maintain clarity
-                dest_path = os.path.join(dest_folder, f"{name_part}_{counter}_{dest_name_status}{ext_part}")
-                counter += 1
+    def start_post_processing(self):
+        self.dest_index = DestinationIndex()
+        self._post_processor = PostProcessor(self.rename_and_move)
 
-            shutil.move(source, dest_path)
-            self.log(f"📁 Moved '{os.path.basename(file)}' to: '{os.path.basename(dest_path)}'")
+    def stop_post_processing(self):
+        """Finishes the queued moves (so they are all logged before the summary)."""
+        if self._post_processor:
+            self._post_processor.close()
+            self._post_processor = None
 
-        except Exception as e:
-            self.log(f"❌ Error moving file '{file}': {e}")
+    def post_process(self, file, success, status=None):
+        """Hands a finished file to the background mover, or moves it right away outside a run."""
+        if self._post_processor:
+            self._post_processor.submit(file, success, status)
+        else:
+            self.rename_and_move(file, success, status)
 
     def load_mapping_data(self):
         """
         Loads and validates the Excel/CSV mapping file.
         Expects 'Title' (original filename stem) and 'FinalName' (target system identifier).
+        Returns a {casefolded Title: FinalName} index (see build_title_index).
+        The cleaned mapping is cached on disk (see MappingCache), so an unchanged file is
+        not parsed again on the next run.
         """
         try:
+            self._mapping_mtime = os.stat(self.excel_path).st_mtime_ns
             ext = Path(self.excel_path).suffix.lower()
             self.log(f"📄 Reading mapping file: {os.path.basename(self.excel_path)} (format: {ext})")
+            if ext not in [".csv", ".xls", ".xlsx"]:
+                raise ValueError(f"Unsupported file format for mapping: {ext}. Please use .csv, .xls, or .xlsx.")
+
+            cache_key = None
+            if self.mapping_cache:
+                df, cache_key = self.mapping_cache.get(self.excel_path)
+                if df is not None:
+                    mapping = build_title_index(df, log=self.log)
+                    self.log(f"⚡ Loaded {len(df)} valid mappings from cache ({len(mapping)} unique titles).")
+                    return mapping
 
             if ext == ".csv":
                 df = pd.read_csv(self.excel_path)
-            elif ext in [".xls", ".xlsx"]:
-                df = pd.read_excel(self.excel_path, engine="openpyxl")
             else:
-                raise ValueError(f"Unsupported file format for mapping: {ext}. Please use .csv, .xls, or .xlsx.")
+                df = pd.read_excel(self.excel_path, engine="openpyxl")
 
             # Validate required columns
             required_columns = ['Title', 'FinalName']
@@ -182,17 +900,26 @@ class DocumentUploader: # Generalized class name from CRMUploader
             if missing_columns:
                 raise ValueError(f"Missing required columns in mapping file: {missing_columns}. Expected 'Title' and 'FinalName'.")
 
+            # Remove rows where either 'Title' or 'FinalName' is missing (before astype turns NaN into 'nan')
+            df = df.dropna(subset=['Title', 'FinalName'])
+
             # Clean whitespace from columns
             df['Title'] = df['Title'].astype(str).str.strip()
             df['FinalName'] = df['FinalName'].astype(str).str.strip()
 
             # Remove rows where either 'Title' or 'FinalName' is empty
-            df = df.dropna(subset=['Title', 'FinalName'])
             df = df[df['Title'] != '']
             df = df[df['FinalName'] != '']
 
-            self.log(f"✅ Loaded {len(df)} valid mappings from file.")
-            return df
+            if cache_key:
+                try:
+                    self.mapping_cache.put(cache_key, df[['Title', 'FinalName']])
+                except Exception as e:
+                    self.log(f"⚠️ Warning: Could not cache the mapping (will parse it again next time): {e}")
+
+            mapping = build_title_index(df, log=self.log)
+            self.log(f"✅ Loaded {len(df)} valid mappings from file ({len(mapping)} unique titles).")
+            return mapping
 
         except FileNotFoundError:
             self.log(f"❌ Mapping file not found at: {self.excel_path}")
@@ -210,15 +937,13 @@ class DocumentUploader: # Generalized class name from CRMUploader
             if not os.path.exists(self.upload_folder):
                 raise FileNotFoundError(f"Upload folder not found: {self.upload_folder}")
 
-            # Define supported file extensions for documents
-            supported_extensions = (
-                ".pdf", ".docx", ".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".webp", ".jfif", ".svg", ".txt", ".csv", ".xls", ".xlsx"
-            )
-            files = [f for f in os.listdir(self.upload_folder)
-                     if f.lower().endswith(supported_extensions) and os.path.isfile(os.path.join(self.upload_folder, f))]
+            # is_file() comes from the directory listing itself, so no extra stat per file
+            with os.scandir(self.upload_folder) as entries:
+                files = [entry.name for entry in entries
+                         if entry.name.lower().endswith(SUPPORTED_EXTENSIONS) and entry.is_file()]
 
             if not files:
-                self.log(f"⚠️ No supported files found in upload folder: {self.upload_folder}. Supported types: {', '.join(supported_extensions)}")
+                self.log(f"⚠️ No supported files found in upload folder: {self.upload_folder}. Supported types: {', '.join(SUPPORTED_EXTENSIONS)}")
                 raise ValueError("No supported files found in upload folder.")
 
             self.log(f"📁 Found {len(files)} files to process in '{self.upload_folder}'.")
@@ -228,77 +953,254 @@ class DocumentUploader: # Generalized class name from CRMUploader
             self.log(f"❌ Error scanning upload folder: {e}")
             raise
 
-    def upload_files(self, page):
+    def upload_files(self, page, watch=False):
         """
-        Main function to orchestrate the simulated upload of multiple documents.
-        This function iterates through files, calls upload_single (simulated),
-        and moves files to appropriate success/failure folders.
+        Main function to orchestrate the upload of multiple documents.
+        Files are put on a work queue drained by `workers` browser contexts: this page, plus
+        workers - 1 threads that each open their own context from this page's logged-in storage
+        state. Each worker calls upload_single and moves the file to the success/failure folder.
+        With watch=True the queue is fed by a FolderWatcher instead of a one-off folder listing,
+        and the workers keep waiting for new files until the run is aborted.
         """
         try:
             self.log("📤 Beginning simulated document upload process...")
-            # Simulate navigating to the upload page
-            self.log(f"  Simulating navigation to upload page: {GENERIC_UPLOAD_URL}")
-            time.sleep(2) # Simulate page load time
+            if not self.base_url:
+                # Simulate navigating to the upload page
+                self.log(f"  Simulating navigation to upload page: {GENERIC_UPLOAD_URL}")
+                time.sleep(2) # Simulate page load time
 
-            df = self.load_mapping_data() # Load mappings
-            files = self.get_files_to_upload() # Get files to upload
+            mapping = self.load_mapping_data() # Load mappings
+            watcher = self.start_watching() if watch else None
+            files = [] if watch else self.get_files_to_upload() # Get files to upload
+            total = None if watch else len(files)
 
-            uploaded_count = 0
-            failed_count = 0
+            jobs = queue.Queue()
+            for job in enumerate(files, 1):
+                jobs.put(job)
+            self.counts = UploadCounts()
+            self.start_hashing(files)
+            self.start_post_processing()
 
-            for i, file in enumerate(files, 1):
-                if self.abort_flag and self.abort_flag.is_set():
-                    self.log("⏹️ Upload aborted by user.")
-                    break
+            threads = []
+            if watch:
+                threads.append(threading.Thread(target=self.feed_watched_files, name="folder-watcher",
+                                                args=(watcher, jobs, mapping), daemon=True))
+                threads[0].start()
+            worker_count = self.workers if watch else min(self.workers, len(files))
+            if worker_count > 1:
+                storage_state = self._storage_state or page.context.storage_state() # Logged-in cookies/local storage
+                self.log(f"🧵 Uploading with {worker_count} parallel browser contexts.")
+                for worker_id in range(2, worker_count + 1):
+                    thread = threading.Thread(target=self.pool_worker, name=f"upload-worker-{worker_id}",
+                                              args=(worker_id, storage_state, jobs, mapping, total, watch), daemon=True)
+                    thread.start()
+                    threads.append(thread)
+
+            self.process_queue(page, jobs, mapping, total, wait=watch) # This thread is worker 1
+            for thread in threads:
+                thread.join()
+            self.stop_post_processing()
+
+            self.log_summary()
+
+        except Exception as e:
+            self.log(f"❌ Critical error during simulated upload process: {e}")
+        finally:
+            self.stop_hashing()
+            self.stop_post_processing()
+
+    def log_outcome(self, file, success, started):
+        """Structured upload result for the JSONL log (the UI already got the readable message)."""
+        self.log("", file=file, stage="upload", outcome="uploaded" if success else "failed",
+                 duration=time.monotonic() - started, echo=False)
 
-                self.log(f"\n📁 Processing file {i}/{len(files)}: '{file}'")
-                # Call the simulated single file upload
-                success = self.upload_single(page, file, df)
+    def log_summary(self):
+        self.log(f"\n📊 Upload Summary:")
+        self.log(f"✅ Successfully processed (simulated): {self.counts.uploaded}")
+        self.log(f"❌ Failed to process (simulated): {self.counts.failed}")
+        if self.counts.skipped:
+            self.log(f"⏭️ Skipped as already uploaded: {self.counts.skipped}")
+        self.log(f"📁 Total files attempted: {self.counts.uploaded + self.counts.failed}")
 
-                if self.abort_flag and self.abort_flag.is_set():
+    def start_hashing(self, files):
+        """Hashes every file on a thread pool, so each hash is ready by the time a worker reaches the file."""
+        if not self.ledger:
+            return
+        self._hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+        self._hashes = {}
+        for file in files:
+            self.hash_later(file)
+
+    def hash_later(self, file):
+        if self._hash_pool:
+            self._hashes[file] = self._hash_pool.submit(file_sha256, os.path.join(self.upload_folder, file))
+
+    def stop_hashing(self):
+        if self._hash_pool:
+            self._hash_pool.shutdown(wait=False, cancel_futures=True) # Nothing left to hash after an abort
+            self._hash_pool = None
+
+    def content_hash(self, file):
+        """The file's SHA-256 for the ledger (usually hashed ahead already), or None when there is nothing to track."""
+        if not self.ledger:
+            return None
+        try:
+            future = self._hashes.pop(file, None)
+            return future.result() if future else file_sha256(os.path.join(self.upload_folder, file))
+        except Exception as e:
+            self.log(f"⚠️ Warning: Could not hash '{file}', uploading without the duplicate check: {e}")
+            return None
+
+    def claim_upload(self, file):
+        """
+        Checks the file's content hash against the ledger. Returns the hash to release after the
+        upload, or None when there is nothing to track. Known duplicates are logged, counted and
+        moved as 'skipped' here, and come back as False. A copy of a file still uploading waits
+        for that upload: skipped if it succeeded, uploaded itself if it failed. An abort while
+        waiting also returns False and leaves the file where it is.
+        """
+        sha256 = self.content_hash(file)
+        if not sha256:
+            return None
+        while True:
+            previous = self.ledger.claim(sha256, file)
+            if previous is None:
+                return sha256
+            if "pending" not in previous:
+                return self.skip_duplicate(file, previous)
+            self.log_waiting(file, previous)
+            while not previous["pending"].wait(0.5):
+                if self.is_aborted():
+                    return False
+
+    def log_waiting(self, file, previous):
+        self.log(f"⏳ '{file}' has the same content as '{previous['filename']}', which is uploading now; waiting for it.")
+
+    def skip_duplicate(self, file, previous):
+        """Logs, counts and moves a file whose content the ledger already has. Returns False."""
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(previous["uploaded_at"]))
+        self.log(f"⏭️ Skipped '{file}': same content as '{previous['filename']}', already uploaded "
+                 f"to '{previous['final_name']}' ({previous['document_type']}) on {when}.",
+                 file=file, stage="ledger", outcome="skipped")
+        self.counts.record_skipped()
+        self.post_process(file, True, status="skipped")
+        return False
+
+    def release_upload(self, sha256, file, success, mapping):
+        if sha256:
+            self.ledger.release(sha256, success, final_name=mapping.get(Path(file).stem.casefold()),
+                                document_type=self.document_type_api_code)
+
+    def start_watching(self):
+        watcher = FolderWatcher(self.upload_folder)
+        self.log(f"👀 Watching '{self.upload_folder}' for new files ({watcher.mode}). Files are taken once they "
+                 f"stop changing for {watcher.settle_seconds:g}s. Abort to stop.")
+        return watcher
+
+    def next_watched_files(self, watcher, mapping):
+        """One watch step: waits briefly for settled files and starts hashing them; reloads the mapping if it changed."""
+        ready = watcher.poll()
+        if ready:
+            self.refresh_mapping(mapping)
+            for file in ready:
+                self.hash_later(file)
+        return ready
+
+    def refresh_mapping(self, mapping):
+        """Reloads the mapping in place when its file was modified, so long watches see new rows."""
+        try:
+            if os.stat(self.excel_path).st_mtime_ns == self._mapping_mtime:
+                return
+            fresh = self.load_mapping_data()
+        except Exception:
+            return # Already logged; keep using the mapping we have
+        for key in mapping.keys() - fresh.keys():
+            mapping.pop(key, None)
+        mapping.update(fresh)
+
+    def feed_watched_files(self, watcher, jobs, mapping):
+        """Watch-mode producer thread: queues files from the watcher until the run is aborted."""
+        count = 0
+        try:
+            while not self.is_aborted():
+                for file in self.next_watched_files(watcher, mapping):
+                    count += 1
+                    jobs.put((count, file))
+        except Exception as e:
+            self.log(f"❌ Folder watcher stopped: {e}")
+        finally:
+            watcher.close()
+
+    def process_queue(self, page, jobs, mapping, total, wait=False):
+        """
+        Uploads files from the work queue on `page` until it is empty or the run is aborted.
+        With wait=True (watch mode) an empty queue is waited on instead.
+        """
+        while True:
+            if self.is_aborted():
+                if self.counts.first_abort():
                     self.log("⏹️ Upload aborted by user.")
-                    break
+                return
+            try:
+                i, file = jobs.get(timeout=0.5) if wait else jobs.get_nowait()
+            except queue.Empty:
+                if wait:
+                    continue
+                return
 
-                if success:
-                    uploaded_count += 1
-                else:
-                    failed_count += 1
+            self.log(f"\n📁 Processing file {i}/{total}: '{file}'" if total else f"\n📁 Processing new file {i}: '{file}'")
+            sha256 = self.claim_upload(file)
+            if sha256 is False:
+                continue
+            started = time.monotonic()
+            success = self.upload_single(page, file, mapping)
+            self.log_outcome(file, success, started)
+            self.release_upload(sha256, file, success, mapping) # Recorded even if aborted now, so it is not re-sent
 
-                self.rename_and_move(file, success)
+            if self.is_aborted(): # Leave an interrupted file where it is, as before
+                if self.counts.first_abort():
+                    self.log("⏹️ Upload aborted by user.")
+                return
 
-            self.log(f"\n📊 Upload Summary:")
-            self.log(f"✅ Successfully processed (simulated): {uploaded_count}")
-            self.log(f"❌ Failed to process (simulated): {failed_count}")
-            self.log(f"📁 Total files attempted: {uploaded_count + failed_count}")
+            self.counts.record(success)
+            self.post_process(file, success)
 
+    def pool_worker(self, worker_id, storage_state, jobs, mapping, total, wait=False):
+        """
+        Extra upload worker. Playwright's sync objects belong to the thread that created them,
+        so each worker starts its own Playwright and browser and opens a context from the shared
+        storage state (already logged in, no second login).
+        """
+        try:
+            with sync_playwright() as p:
+                browser = self.launch_browser(p)
+                try:
+                    page = self.new_context(browser, storage_state=storage_state).new_page()
+                    self.disable_resources(page)
+                    self.process_queue(page, jobs, mapping, total, wait)
+                finally:
+                    browser.close()
         except Exception as e:
-            self.log(f"❌ Critical error during simulated upload process: {e}")
+            self.log(f"❌ Upload worker {worker_id} stopped (remaining files go to the other workers): {e}")
 
-    def upload_single(self, page, file, df):
+    def upload_single(self, page, file, mapping):
         """
         Simulates the upload of a single file and filling of form fields.
+        `mapping` is the Title index from load_mapping_data().
         No actual Playwright interactions for file upload or form submission occur here.
         """
-        if self.abort_flag and self.abort_flag.is_set():
+        if self.is_aborted():
             self.log("⏹️ Upload aborted before processing file.")
             return False
 
         try:
             file_path = os.path.join(self.upload_folder, file)
-            title = Path(file).stem
-
-            # Find matching record in mapping data
-            match = df[df['Title'].str.lower() == title.lower()]
-            if match.empty:
-                self.log(f"❌ No mapping found for original filename '{title}' in the provided Excel/CSV file.")
-                return False
-
-            final_name = str(match.iloc[0]['FinalName']).strip()
+            final_name = self.resolve_final_name(file, mapping)
             if not final_name:
-                self.log(f"❌ 'FinalName' is empty for '{title}' in mapping file.")
                 return False
 
-            self.log(f"📋 Mapping found: Original '{title}' → Target System Identifier '{final_name}'")
+            if self.base_url:
+                return self.upload_live(page, file, file_path, final_name)
 
             # --- Simulate web interaction ---
             # Simulate navigating to upload page and waiting for elements
@@ -324,10 +1226,98 @@ class DocumentUploader: # Generalized class name from CRMUploader
             self.log(f"❌ Simulated upload failed for '{file}': {e}")
             return False
 
-    def run(self):
+    def resolve_final_name(self, file, mapping):
+        """FinalName for the file from the Title index, or None (logged) when it has no usable mapping."""
+        title = Path(file).stem
+
+        # Find matching record in mapping data (constant-time, case-insensitive)
+        final_name = mapping.get(title.casefold())
+        if final_name is None:
+            self.log(f"❌ No mapping found for original filename '{title}' in the provided Excel/CSV file.")
+            return None
+
+        if not final_name:
+            self.log(f"❌ 'FinalName' is empty for '{title}' in mapping file.")
+            return None
+
+        self.log(f"📋 Mapping found: Original '{title}' → Target System Identifier '{final_name}'")
+        return final_name
+
+    def upload_live(self, page, file, file_path, final_name):
+        """Uploads one file through the upload page at base_url and waits for the saved confirmation."""
+        try:
+            page.goto(self.base_url + UPLOAD_PATH, timeout=30000)
+            if page.locator(USERNAME_INPUT_SELECTOR).count() > 0: # Session expired: bounced to the login form
+                if not self.relogin(page):
+                    self.log(f"❌ Could not log in again to upload '{file}'.")
+                    return False
+                page.goto(self.base_url + UPLOAD_PATH, timeout=30000)
+            page.set_input_files(UPLOAD_FILE_INPUT_SELECTOR, file_path)
+            page.evaluate("([field, code]) => rbf_setPicklistCode(field, code)",
+                          [DOCUMENT_TYPE_FIELD, self.document_type_api_code])
+            page.evaluate("([field, value]) => rbf_setFieldValue(field, value)",
+                          [self.field_to_fill_api_name, final_name])
+            page.click(SUBMIT_FORM_BUTTON_SELECTOR)
+            page.wait_for_load_state("load", timeout=30000)
+            if page.locator(UPLOAD_SUCCESS_SELECTOR).count() == 0:
+                self.log(f"❌ Upload was not confirmed for '{file}'.")
+                return False
+            self.log(f"✅ Uploaded: '{file}'.")
+            return True
+        except Exception as e:
+            self.log(f"❌ Upload failed for '{file}': {e}")
+            return False
+
+    def launch_browser(self, p):
+        """Launches headless Chromium with the automation-friendly flags."""
+        return p.chromium.launch(
+            headless=True, # Recommended for automation
+            args=[
+                '--no-sandbox', # Recommended for CI/CD environments
+                '--disable-dev-shm-usage',
+                '--disable-web-security', # Be cautious with this in real scenarios
+                '--disable-features=VizDisplayCompositor'
+            ]
+        )
+
+    def new_context(self, browser, storage_state=None):
+        """Opens an isolated browser context, optionally starting from a saved (logged-in) storage state."""
+        return browser.new_context(
+            viewport={'width': 1280, 'height': 720}, # Standard viewport for consistency
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36', # Common user agent
+            storage_state=storage_state
+        )
+
+    def run_browser(self, watch=False):
+        """Logs in and uploads through Chromium pages (the default engine)."""
+        # Playwright context is conceptually set up, but actual browser interactions are skipped for sensitive URLs.
+        # This block primarily demonstrates the *structure* of using Playwright.
+        with sync_playwright() as p:
+            # Playwright launch is still here to demonstrate the *capability* of browser automation,
+            # but the actual browser interactions for sensitive URLs are mocked/simulated within methods.
+            browser = self.launch_browser(p)
+
+            try:
+                page = self.start_session(browser) # Saved login, or the (simulated) login
+                if page:
+                    self.upload_files(page, watch) # Calls the simulated upload
+                else:
+                    self.log("❌ Exiting due to simulated login failure.")
+
+            except Exception as e:
+                self.log(f"❌ An unexpected error occurred during browser automation (simulated): {e}")
+
+            finally:
+                # Ensure the browser is closed in a real scenario
+                self.log("Browser context closed (simulated).")
+                browser.close()
+
+    def run(self, watch=False):
         """
         Main execution method for the document uploader automation.
         Launches a headless browser (conceptually) and orchestrates login and upload.
+        watch=True keeps the session open and uploads files as they land in upload_folder
+        until abort_flag is set.
         """
         try:
             self.log("🚀 Starting document upload automation (simulated interactions)...")
@@ -338,47 +1328,263 @@ class DocumentUploader: # Generalized class name from CRMUploader
                        self.field_to_fill_api_name, self.document_type_api_code]):
                 raise ValueError("Missing required configuration parameters. Please check all paths and API mappings.")
 
-            # Playwright context is conceptually set up, but actual browser interactions are skipped for sensitive URLs.
-            # This block primarily demonstrates the *structure* of using Playwright.
-            with sync_playwright() as p:
-                # Playwright launch is still here to demonstrate the *capability* of browser automation,
-                # but the actual browser interactions for sensitive URLs are mocked/simulated within methods.
-                browser = p.chromium.launch(
-                    headless=True, # Recommended for automation
-                    args=[
-                        '--no-sandbox', # Recommended for CI/CD environments
-                        '--disable-dev-shm-usage',
-                        '--disable-web-security', # Be cautious with this in real scenarios
-                        '--disable-features=VizDisplayCompositor'
-                    ]
-                )
-
-                context = browser.new_context(
-                    viewport={'width': 1280, 'height': 720}, # Standard viewport for consistency
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36' # Common user agent
-                )
-
-                page = context.new_page()
-
+            if self.use_ledger:
                 try:
-                    self.disable_resources(page) # Still useful for conceptual speed up
-
-                    if self.login(page): # Calls the simulated login
-                        self.upload_files(page) # Calls the simulated upload
-                    else:
-                        self.log("❌ Exiting due to simulated login failure.")
-
-                except Exception as e:
-                    self.log(f"❌ An unexpected error occurred during browser automation (simulated): {e}")
+                    self.ledger = UploadLedger()
+                except (OSError, sqlite3.Error) as e:
+                    self.log(f"⚠️ Warning: Could not open the upload ledger, duplicates will not be detected: {e}")
 
-                finally:
-                    # Ensure the browser is closed in a real scenario
-                    self.log("Browser context closed (simulated).")
-                    browser.close()
+            if self.engine == ENGINE_HTTP:
+                HttpUploadEngine(self).run(watch)
+            else:
+                self.run_browser(watch)
 
         except Exception as e:
             self.log(f"❌ A critical error occurred during the overall process: {e}")
 
         finally:
+            if self.ledger:
+                self.ledger.close()
+                self.ledger = None
             self.log("🏁 Process completed. Log exported.")
             self.export_log(as_csv=True)
+            self.log_stream.close()
+
+
+class HttpUploadEngine:
+    """
+    Uploads without a browser: logs in once over HTTP (or reuses the saved storage state),
+    then posts each document to the upload form as multipart/form-data, the same fields the
+    page's file input and rbf_setPicklistCode/rbf_setFieldValue helpers would submit.
+    Requests share one pooled aiohttp session, with up to `uploader.workers` in flight.
+    Needs a live base_url (e.g. mock_server.py), since there is nothing to post to in simulated mode.
+    """
+    def __init__(self, uploader):
+        self.uploader = uploader
+        self.login_lock = None # asyncio.Lock, created inside the event loop
+
+    def run(self, watch=False):
+        asyncio.run(self.upload_all(watch))
+
+    async def upload_all(self, watch=False):
+        u = self.uploader
+        if not u.base_url:
+            u.log("❌ The HTTP upload engine needs a base_url to post to.")
+            return
+        try:
+            import aiohttp # Only needed by this engine
+        except ImportError:
+            u.log("❌ The HTTP upload engine needs aiohttp (pip install aiohttp).")
+            return
+
+        self.login_lock = asyncio.Lock()
+        connector = aiohttp.TCPConnector(limit=u.workers) # One pooled keep-alive connection per worker
+        cookie_jar = aiohttp.CookieJar(unsafe=True) # unsafe=True keeps cookies set by IP-address hosts like 127.0.0.1
+        async with aiohttp.ClientSession(connector=connector, cookie_jar=cookie_jar,
+                                         timeout=aiohttp.ClientTimeout(total=120)) as session:
+            if not await self.start_session(session):
+                u.log("❌ Exiting due to login failure.")
+                return
+            try:
+                u.log("📤 Beginning direct HTTP document upload process...")
+                mapping = u.load_mapping_data()
+                watcher = u.start_watching() if watch else None
+                files = [] if watch else u.get_files_to_upload()
+                total = None if watch else len(files)
+
+                jobs = asyncio.Queue()
+                for job in enumerate(files, 1):
+                    jobs.put_nowait(job)
+                u.counts = UploadCounts()
+                u.start_hashing(files)
+                u.start_post_processing()
+                worker_count = u.workers if watch else min(u.workers, len(files))
+                u.log(f"🧵 Posting with {worker_count} concurrent HTTP workers.")
+                tasks = [self.worker(session, jobs, mapping, total, watch) for _ in range(worker_count)]
+                if watch:
+                    tasks.append(self.feed(watcher, jobs, mapping))
+                await asyncio.gather(*tasks)
+                await asyncio.to_thread(u.stop_post_processing)
+                u.log_summary()
+            except Exception as e:
+                u.log(f"❌ Critical error during HTTP upload process: {e}")
+            finally:
+                u.stop_hashing()
+                u.stop_post_processing()
+
+    async def feed(self, watcher, jobs, mapping):
+        """Watch-mode producer: queues files from the watcher (polled in a thread) until the run is aborted."""
+        u = self.uploader
+        count = 0
+        try:
+            while not u.is_aborted():
+                for file in await asyncio.to_thread(u.next_watched_files, watcher, mapping):
+                    count += 1
+                    jobs.put_nowait((count, file))
+        except Exception as e:
+            u.log(f"❌ Folder watcher stopped: {e}")
+        finally:
+            watcher.close()
+
+    async def worker(self, session, jobs, mapping, total, wait=False):
+        u = self.uploader
+        while True:
+            if u.is_aborted():
+                if u.counts.first_abort():
+                    u.log("⏹️ Upload aborted by user.")
+                return
+            try:
+                i, file = await asyncio.wait_for(jobs.get(), 0.5) if wait else jobs.get_nowait()
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                if wait:
+                    continue
+                return
+
+            u.log(f"\n📁 Processing file {i}/{total}: '{file}'" if total else f"\n📁 Processing new file {i}: '{file}'")
+            sha256 = await self.claim(file)
+            if sha256 is False:
+                continue
+            final_name = u.resolve_final_name(file, mapping)
+            started = time.monotonic()
+            success = bool(final_name) and await self.upload(session, file, final_name)
+            u.log_outcome(file, success, started)
+            u.release_upload(sha256, file, success, mapping) # Recorded even if aborted now, so it is not re-sent
+
+            if u.is_aborted(): # Leave an interrupted file where it is, like the browser engine
+                if u.counts.first_abort():
+                    u.log("⏹️ Upload aborted by user.")
+                return
+
+            u.counts.record(success)
+            u.post_process(file, success) # Moved by the background stage, off the event loop
+
+    async def claim(self, file):
+        """
+        claim_upload for the event loop: a copy of a file still uploading is waited on here with
+        asyncio.sleep, not by blocking an executor thread the twin's upload may itself need.
+        """
+        u = self.uploader
+        if file in u._hashes:
+            await asyncio.wait([asyncio.wrap_future(u._hashes[file])]) # Don't block the loop on the hash
+        sha256 = await asyncio.to_thread(u.content_hash, file) # Hashes here only if it was not queued ahead
+        if not sha256:
+            return None
+        while True:
+            previous = u.ledger.claim(sha256, file)
+            if previous is None:
+                return sha256
+            if "pending" not in previous:
+                return u.skip_duplicate(file, previous)
+            u.log_waiting(file, previous)
+            while not previous["pending"].is_set():
+                if u.is_aborted():
+                    return False
+                await asyncio.sleep(0.1)
+
+    def cookie_url(self):
+        from yarl import URL # Ships with aiohttp
+        return URL(self.uploader.base_url)
+
+    def export_state(self, session):
+        """The session's cookies in Playwright storage-state form, so the browser engine can reuse them too."""
+        host = self.cookie_url().host
+        cookies = []
+        for morsel in session.cookie_jar:
+            max_age = morsel["max-age"]
+            cookies.append({
+                "name": morsel.key, "value": morsel.value, "domain": morsel["domain"] or host,
+                "path": morsel["path"] or "/", "expires": time.time() + int(max_age) if max_age else -1,
+                "httpOnly": bool(morsel["httponly"]), "secure": bool(morsel["secure"]), "sameSite": "Lax",
+            })
+        return {"cookies": cookies, "origins": []}
+
+    async def session_accepted(self, session):
+        """True if the upload page opens without a redirect to the login form."""
+        try:
+            async with session.get(self.uploader.base_url + UPLOAD_PATH) as response:
+                await response.read()
+                return response.status == 200 and response.url.path != LOGIN_PATH
+        except Exception:
+            return False
+
+    async def start_session(self, session):
+        """Reuses the saved storage state if the server still accepts it, otherwise logs in over HTTP."""
+        u = self.uploader
+        saved_state = u.load_storage_state()
+        if saved_state:
+            session.cookie_jar.update_cookies({c["name"]: c["value"] for c in saved_state.get("cookies", [])},
+                                              response_url=self.cookie_url())
+            if await self.session_accepted(session):
+                u._storage_state = saved_state
+                u.log("🔓 Reusing saved login (skipped the login page).")
+                return True
+            u.log("🔐 Saved login was rejected; logging in again.")
+            session.cookie_jar.clear()
+            u.discard_storage_state()
+        return await self.login(session)
+
+    async def login(self, session):
+        u = self.uploader
+        u.log(f"🔐 Logging in over HTTP at: {u.login_url()}")
+        try:
+            async with session.post(u.login_url(), data={"username": u.username, "password": u.password}) as response:
+                await response.read()
+                if response.status != 200 or response.url.path == LOGIN_PATH: # Still on the login form
+                    u.log("❌ Login failed. Check credentials.")
+                    return False
+        except Exception as e:
+            u.log(f"❌ Login error: {e}")
+            return False
+        u.log("✅ Login successful.")
+        u.save_storage_state(self.export_state(session))
+        return True
+
+    async def relogin(self, session):
+        """Single-flight re-login: whoever gets the lock first logs in, the rest find the session valid again."""
+        async with self.login_lock:
+            if await self.session_accepted(session):
+                return True
+            self.uploader.log("🔐 Session was rejected mid-run; logging in again.")
+            return await self.login(session)
+
+    async def upload(self, session, file, final_name):
+        """Posts one document. Returns True once the server confirms it was saved."""
+        u = self.uploader
+        file_path = os.path.join(u.upload_folder, file)
+        content_type = mimetypes.guess_type(file)[0] or "application/octet-stream"
+        for attempt in range(2): # A second try only after re-logging in
+            document = None
+            try:
+                document = open(file_path, "rb") # A fresh handle per attempt: a sent body cannot be replayed
+                form = self.build_form(file, document, content_type, final_name)
+                async with session.post(u.base_url + UPLOAD_PATH, data=form) as response:
+                    body = await response.text()
+                    if response.url.path == LOGIN_PATH and attempt == 0: # Session expired: bounced to the login form
+                        if await self.relogin(session):
+                            continue
+                        u.log(f"❌ Could not log in again to upload '{file}'.")
+                        return False
+                    if response.status == 200 and UPLOAD_SUCCESS_SELECTOR.lstrip(".") in body:
+                        u.log(f"✅ Uploaded: '{file}'.")
+                        return True
+                    u.log(f"❌ Upload was not confirmed for '{file}' (HTTP {response.status}).")
+                    return False
+            except Exception as e:
+                u.log(f"❌ Upload failed for '{file}': {e}")
+                return False
+            finally:
+                if document:
+                    document.close()
+        return False
+
+    def build_form(self, file, document, content_type, final_name):
+        """
+        Multipart body with the file and the two values the page's JS helpers would set. The
+        document is an open binary file that aiohttp streams in chunks, never reading it whole.
+        """
+        import aiohttp
+        form = aiohttp.FormData()
+        form.add_field(UPLOAD_FILE_FIELD, document, filename=file, content_type=content_type)
+        form.add_field(DOCUMENT_TYPE_FIELD, self.uploader.document_type_api_code)
+        form.add_field(self.uploader.field_to_fill_api_name, final_name)
+        return form